@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Serve the hot read endpoints with the native async views
+os.environ.setdefault('DJANGO_ROOT_URLCONF', 'backend.async_urls')
 
 application = get_asgi_application()
+
+from tasks.queue import start_server_workers  # noqa: E402 (needs the app registry)
+
+start_server_workers()
@@ -0,0 +1,31 @@
+"""URLconf of the ASGI deployment (selected in backend/asgi.py).
+
+Same routes as backend.urls, except that GET/HEAD on the hot read
+endpoints is answered by the native async views of backend.async_views;
+any other method on those URLs still reaches the viewset.
+"""
+from django.urls import path, re_path
+
+from cart.views import CartViewSet, my_cart
+from orders.views import OrderViewSet, order_list
+from products.views import ProductViewSet, product_detail, product_list
+from . import urls
+from .async_views import read_view
+
+urlpatterns = [
+    path(
+        'api/products/',
+        read_view(product_list, ProductViewSet.as_view({'get': 'list', 'post': 'create'})),
+        name='products-list',
+    ),
+    # Numeric only, so search/ and cache-stats/ still reach the router
+    re_path(
+        r'^api/products/(?P<pk>[0-9]+)/$',
+        read_view(product_detail, ProductViewSet.as_view(
+            {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+        )),
+        name='products-detail',
+    ),
+    path('api/cart/my_cart/', read_view(my_cart, CartViewSet.as_view({'get': 'my_cart'})), name='cart-my-cart'),
+    path('api/orders/', read_view(order_list, OrderViewSet.as_view({'get': 'list'})), name='orders-list'),
+] + urls.urlpatterns
@@ -0,0 +1,83 @@
+"""Plumbing for the native async read views of the ASGI deployment.
+
+DRF views only run synchronously, so under ASGI every request to them
+holds a thread for its whole duration. The hot read endpoints (product
+list and detail, ``my_cart`` and the order history) therefore also have
+``async def`` implementations that query through the async ORM and reuse
+the DRF serializers and paginators, so the payloads stay identical.
+
+``read_view`` serves GET/HEAD with such a coroutine and hands every other
+method to the regular viewset view, so a URL behaves like its router
+route. Authentication and error bodies follow DRF's; see
+backend.async_urls for the routes.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from users.authentication import CachedJWTAuthentication
+from .renderers import FastJSONRenderer
+
+authenticator = CachedJWTAuthentication()
+
+
+async def authenticate(request, required=False):
+    """Resolve the JWT user of ``request`` the way the viewsets do.
+
+    Invalid credentials always fail; missing ones only when ``required``.
+    """
+    # APIClient.force_authenticate, as honoured by DRF's Request
+    user = getattr(request, '_force_auth_user', None)
+    if user is None:
+        result = await authenticator.aauthenticate(request)
+        if result is None:
+            if required:
+                raise exceptions.NotAuthenticated()
+            return None
+        user = result[0]
+    # DRF sets it too; the replica router reads it to pin writers
+    request.user = user
+    return user
+
+
+def api_request(request):
+    """Wrap ``request`` for DRF paginators and serializers (no parsing, no auth)."""
+    return Request(request)
+
+
+def _handle_exception(exc, request):
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        exc.auth_header = authenticator.authenticate_header(request)
+    response = exception_handler(exc, {'request': request})
+    if response is None:
+        raise exc
+    return response
+
+
+def _render(response):
+    if isinstance(response, Response) and getattr(response, 'accepted_renderer', None) is None:
+        response.accepted_renderer = FastJSONRenderer()
+        response.accepted_media_type = FastJSONRenderer.media_type
+        response.renderer_context = {}
+    return response
+
+
+def read_view(handler, fallback):
+    """Route GET/HEAD to the coroutine ``handler`` and the rest to ``fallback``."""
+    fallback = sync_to_async(fallback)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await fallback(request, *args, **kwargs)
+        try:
+            response = await handler(request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as exc:
+            response = _handle_exception(exc, request)
+        return _render(response)
+
+    view.__name__ = handler.__name__
+    return csrf_exempt(view)
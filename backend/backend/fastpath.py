@@ -0,0 +1,173 @@
+"""Compiled serialization for the hot read endpoints.
+
+``Serializer.data`` resolves every field of every row through DRF's generic
+machinery: ``get_attribute`` walks the source, catches lookup errors and
+checks for ``SkipField``, each level builds a ``ReturnDict``. ``serialize``
+looks at the serializer's fields once per response instead and builds plain
+dicts with precompiled attribute getters. Values go through each field's
+own ``to_representation``, a builtin with the same result, or (decimals,
+datetimes) a copy whose per-call setup is done once, so the payload is the
+same as ``serializer.data``.
+
+Rows whose lookup does not resolve cleanly fall back to the field's
+``get_attribute``, keeping DRF's semantics for the odd case.
+``settings.FAST_SERIALIZERS = False`` switches the fast path off.
+"""
+import decimal
+from datetime import datetime
+from operator import attrgetter
+from types import MethodType
+
+from django.conf import settings
+from django.db.models.manager import BaseManager
+from rest_framework import ISO_8601, fields as drf_fields
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject, RelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer, ModelSerializer
+from rest_framework.settings import api_settings
+
+from . import metrics
+
+# Fields whose to_representation is exactly a builtin
+_BUILTIN_REPRESENTATIONS = {
+    drf_fields.CharField: str,
+    drf_fields.IntegerField: int,
+    drf_fields.ReadOnlyField: None,
+}
+
+
+def _decimal_representation(field):
+    # DecimalField.to_representation with the quantize context built once
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def represent(value):
+        if type(value) is not decimal.Decimal:
+            return field.to_representation(value)
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+    return represent
+
+
+def _datetime_representation(field):
+    # DateTimeField.to_representation with the timezone looked up once
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def represent(value):
+        if type(value) is not datetime or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return represent
+
+
+_REPRESENTATION_COMPILERS = {
+    drf_fields.DecimalField: _decimal_representation,
+    drf_fields.DateTimeField: _datetime_representation,
+}
+
+
+def _representation(field):
+    if type(field) in _BUILTIN_REPRESENTATIONS:
+        return _BUILTIN_REPRESENTATIONS[type(field)]
+    compiler = _REPRESENTATION_COMPILERS.get(type(field))
+    return compiler(field) if compiler else field.to_representation
+
+
+def _reader(field):
+    getter = attrgetter('.'.join(field.source_attrs))
+
+    def read(instance):
+        try:
+            value = getter(instance)
+        except (AttributeError, KeyError):
+            return field.get_attribute(instance)
+        if type(value) is MethodType:
+            return value()
+        return value
+    return read
+
+
+def _compile_field(serializer, field):
+    if isinstance(field, ListSerializer):
+        child = compile_serializer(field.child)
+        read = _reader(field)
+
+        def dump(instance):
+            items = read(instance)
+            if items is None:
+                return None
+            if isinstance(items, BaseManager):
+                items = items.all()
+            return [child(item) for item in items]
+        return dump
+
+    if isinstance(field, BaseSerializer):
+        child = compile_serializer(field)
+        read = _reader(field)
+
+        def dump(instance):
+            value = read(instance)
+            return None if value is None else child(value)
+        return dump
+
+    if isinstance(field, drf_fields.SerializerMethodField):
+        return getattr(serializer, field.method_name)
+
+    represent = _representation(field)
+    read = _reader(field) if field.source != '*' else (lambda instance: instance)
+    if isinstance(field, RelatedField):
+        def dump(instance):
+            value = read(instance)
+            if value is None or (isinstance(value, PKOnlyObject) and value.pk is None):
+                return None
+            return value if represent is None else represent(value)
+    elif represent is None:
+        dump = read
+    else:
+        def dump(instance):
+            value = read(instance)
+            return None if value is None else represent(value)
+    return dump
+
+
+def compile_serializer(serializer):
+    """Return ``dump(instance) -> dict`` equal to ``serializer.to_representation``."""
+    fields = [(field.field_name, _compile_field(serializer, field)) for field in serializer._readable_fields]
+
+    def dump(instance):
+        data = {}
+        for name, dump_field in fields:
+            try:
+                data[name] = dump_field(instance)
+            except SkipField:
+                continue
+        return data
+    return dump
+
+
+def serialize(serializer):
+    """``serializer.data`` for read-only responses, through the compiled path.
+
+    Only model serializers are compiled; others (e.g. over ``.values()``
+    rows) go through ``.data``.
+    """
+    many = isinstance(serializer, ListSerializer)
+    with metrics.serializing():
+        if not settings.FAST_SERIALIZERS or not isinstance(serializer.child if many else serializer, ModelSerializer):
+            return serializer.data
+        instance = serializer.instance
+        if many:
+            dump = compile_serializer(serializer.child)
+            if isinstance(instance, BaseManager):
+                instance = instance.all()
+            return [dump(item) for item in instance]
+        return compile_serializer(serializer)(instance)
@@ -0,0 +1,213 @@
+"""Per-request SQL/serializer/view timing.
+
+``RequestMetricsMiddleware`` counts the SQL run on behalf of the request,
+times serialization, and reports the result three ways: a ``Server-Timing``
+response header, a structured log line on the ``backend.metrics`` logger
+and an in-process aggregate per URL name served to admins at
+``/api/_metrics``.
+
+Between request_started and request_finished the connections of the thread
+serving the request carry an ``execute_wrapper`` that reports to the
+metrics of the current request through a context variable. Both signals
+are sent from that thread under WSGI and ASGI alike, and context variables
+follow ``sync_to_async`` into it, so async views are measured the same way
+as sync ones. Serialization is what runs inside ``serializing()``: the
+hot read endpoints' ``backend.fastpath.serialize`` and ``FastJSONRenderer``;
+other ``.data`` calls count as view time.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger('backend.metrics')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'serializer_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsStore:
+    """Thread-safe running totals keyed by "METHOD url_name"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, key, duration, metrics, status_code):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                entry = self._data[key] = {
+                    'count': 0, 'errors': 0, 'queries': 0,
+                    'view_ms': 0.0, 'db_ms': 0.0, 'serializer_ms': 0.0, 'max_view_ms': 0.0,
+                }
+            entry['count'] += 1
+            entry['errors'] += status_code >= 500
+            entry['queries'] += metrics.queries
+            entry['view_ms'] += duration * 1000
+            entry['db_ms'] += metrics.db_time * 1000
+            entry['serializer_ms'] += metrics.serializer_time * 1000
+            entry['max_view_ms'] = max(entry['max_view_ms'], duration * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            data = {key: dict(entry) for key, entry in self._data.items()}
+        for entry in data.values():
+            count = entry['count']
+            entry['avg_view_ms'] = round(entry['view_ms'] / count, 3)
+            entry['avg_db_ms'] = round(entry['db_ms'] / count, 3)
+            entry['avg_serializer_ms'] = round(entry['serializer_ms'] / count, 3)
+            entry['avg_queries'] = round(entry['queries'] / count, 2)
+            for field in ('view_ms', 'db_ms', 'serializer_ms', 'max_view_ms'):
+                entry[field] = round(entry[field], 3)
+        return data
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+store = MetricsStore()
+
+
+def _execute(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+_scopes = threading.local()
+
+
+def _wrap_connections(**kwargs):
+    _unwrap_connections()
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(_execute))
+    _scopes.stack = stack
+
+
+def _unwrap_connections(**kwargs):
+    stack = getattr(_scopes, 'stack', None)
+    if stack is not None:
+        _scopes.stack = None
+        stack.close()
+
+
+@contextmanager
+def serializing():
+    """Count the block as serializer time."""
+    metrics = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.serializer_time += time.perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.enabled = getattr(settings, 'REQUEST_METRICS_ENABLED', True)
+        if self.enabled:
+            request_started.connect(_wrap_connections, dispatch_uid='backend.metrics')
+            request_finished.connect(_unwrap_connections, dispatch_uid='backend.metrics')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, duration):
+        match = request.resolver_match
+        key = f'{request.method} {match.view_name if match else "<unresolved>"}'
+        store.record(key, duration, metrics, response.status_code)
+
+        response['Server-Timing'] = (
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries", '
+            f'ser;dur={metrics.serializer_time * 1000:.2f}, '
+            f'view;dur={duration * 1000:.2f}'
+        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                'request method=%s path=%s view=%s status=%s view_ms=%.2f db_ms=%.2f queries=%d serializer_ms=%.2f',
+                request.method, request.path, key.split(' ', 1)[1], response.status_code,
+                duration * 1000, metrics.db_time * 1000, metrics.queries, metrics.serializer_time * 1000,
+                extra={
+                    'view_name': key, 'status_code': response.status_code, 'view_ms': duration * 1000,
+                    'db_ms': metrics.db_time * 1000, 'queries': metrics.queries,
+                    'serializer_ms': metrics.serializer_time * 1000,
+                },
+            )
+        return response
+
+
+class MetricsView(APIView):
+    """Aggregated request metrics per URL name (admin only)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        from products import cache as product_cache
+
+        return Response({'endpoints': store.snapshot(), 'product_cache': product_cache.get_stats()})
+
+    def delete(self, request):
+        store.reset()
+        return Response(status=204)
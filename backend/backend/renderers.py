@@ -0,0 +1,49 @@
+"""JSON rendering through orjson, byte-compatible with DRF's JSONRenderer.
+
+orjson writes the same compact UTF-8 output as ``JSONRenderer`` with
+``COMPACT_JSON`` and ``UNICODE_JSON`` (the defaults) for the types the API
+emits. Where they would differ it defers to ``JSONRenderer``: indented
+output, types orjson does not know (handed to DRF's encoder via
+``default``), datetimes (DRF writes UTC as ``Z``), and floats orjson
+writes in exponent form (``1e16`` where Python writes ``1e+16``). The one
+known difference is NaN/Infinity, which orjson writes as ``null``; the API
+never emits them. orjson is optional: without it this is plain
+``JSONRenderer``. Rendering counts as serialization in ``backend.metrics``.
+"""
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# A number in exponent form somewhere in the output; may also match text
+# inside strings, which only costs a fallback
+_EXPONENT_RE = re.compile(rb'\de[-+]?\d')
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.serializing():
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if _EXPONENT_RE.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict-JavaScript escaping as JSONRenderer
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,101 @@
+"""Read-replica routing for catalog and order-history reads.
+
+``ReplicaRoutingMiddleware`` remembers the current request;
+``ReplicaRouter`` then sends reads of the apps in ``REPLICA_APPS`` to
+``settings.REPLICA_DATABASE`` when the request uses a safe method. Every
+write goes to ``default`` and pins the writing user to the primary for
+``settings.REPLICA_STICKY_SECONDS`` so they always read their own writes.
+The pin is kept in the ``settings.REPLICA_PIN_CACHE`` cache, which must be
+shared by every worker: a per-process cache would let the user's next
+request land on another worker and read the stale replica, so the
+settings refuse to load a replica without one.
+Outside a request (shell, management commands) everything stays on the
+primary.
+"""
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+REPLICA_APPS = {'products', 'orders'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_current = contextvars.ContextVar('replica_routing', default=None)
+
+
+def pin_key(user_id):
+    return f'replica:pin:{user_id}'
+
+
+class RoutingState:
+    __slots__ = ('request', 'wrote', 'pinned')
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self.pinned = None
+
+    def user_id(self):
+        # DRF copies the authenticated user onto the Django request, so the
+        # JWT user is visible here once the view has authenticated.
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.pk
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current.set(RoutingState(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        token = _current.set(RoutingState(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'REPLICA_DATABASE', None)
+        state = _current.get()
+        if not replica or state is None or model._meta.app_label not in REPLICA_APPS:
+            return None
+        if state.wrote or state.request.method not in SAFE_METHODS:
+            return 'default'
+        if state.pinned is None:
+            user_id = state.user_id()
+            if user_id is None:
+                return replica
+            state.pinned = bool(caches[settings.REPLICA_PIN_CACHE].get(pin_key(user_id)))
+        return 'default' if state.pinned else replica
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None and not state.wrote and getattr(settings, 'REPLICA_DATABASE', None):
+            state.wrote = True
+            user_id = state.user_id()
+            if user_id is not None:
+                caches[settings.REPLICA_PIN_CACHE].set(pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds a copy of the same data
+        return True
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,9 +47,13 @@ INSTALLED_APPS = [
     'products',
     'cart',
     'orders',
+    'tasks',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.RequestMetricsMiddleware',
+    'backend.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -65,8 +72,9 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     # Use JWT for authentication so Authorization: Bearer <token> works
+    # The cached variant skips the per-request user lookup on warm paths
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     # Default permission: keep IsAuthenticated by default but views can
     # override via get_permissions. This prevents accidental open endpoints.
@@ -78,10 +86,16 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.JSONParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
-    ]
+    ],
+    # Same bytes as JSONRenderer, written by orjson when it is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
-ROOT_URLCONF = 'backend.urls'
+# backend/asgi.py switches to backend.async_urls (native async read views)
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'backend.urls')
 
 TEMPLATES = [
     {
@@ -104,12 +118,120 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgresql switches to PostgreSQL with persistent connections
+# (DB_CONN_MAX_AGE) or, with DB_POOL=1, psycopg's connection pool. SQLite
+# runs in WAL mode so readers never block the checkout writer, and takes
+# the write lock at BEGIN so concurrent transactions queue on busy_timeout
+# instead of failing with "database is locked".
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'marketplace'),
+            'USER': os.environ.get('DB_USER', 'marketplace'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_POOL') == '1':
+        # Requires psycopg[pool]; pooling replaces CONN_MAX_AGE
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+else:
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))  # seconds
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000};'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'
+                ),
+            },
+            # File-backed test database so threaded tests see real SQLite
+            # locking instead of the in-memory shared cache.
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+
+# Optional read replica (DB_REPLICA_NAME for SQLite, DB_REPLICA_HOST for
+# PostgreSQL). Product and order reads on safe requests are routed there
+# by backend.routers.ReplicaRouter; writers stick to the primary for
+# REPLICA_STICKY_SECONDS. The pin is stored in the REPLICA_PIN_CACHE cache
+# alias, which must be shared by all workers (see CACHE_URL below).
+if os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'TEST': {'MIRROR': 'default'},
     }
-}
+
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+REPLICA_PIN_CACHE = os.environ.get('REPLICA_PIN_CACHE', 'default')
+DATABASE_ROUTERS = ['backend.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# CACHE_URL=redis://host:6379/0 (pip install redis) or
+# memcached://host:11211 (pip install pymemcache) shares the cache between
+# processes. The product cache versions (products.cache) live here, so any
+# deployment with more than one worker needs it: with the default
+# per-process LocMemCache a write only invalidates the worker that served
+# it and the others keep serving stale payloads until they expire.
+CACHE_URL = os.environ.get('CACHE_URL', '')
+
+if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL.removeprefix('memcached://'),
+        }
+    }
+elif CACHE_URL:
+    raise ImproperlyConfigured(f'CACHE_URL must be a redis:// or memcached:// URL, got {CACHE_URL!r}')
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'marketplace',
+        }
+    }
+
+# Refuse to start rather than let pins vanish between workers
+if REPLICA_DATABASE and CACHES.get(REPLICA_PIN_CACHE, {}).get('BACKEND') in (
+    None, 'django.core.cache.backends.locmem.LocMemCache',
+):
+    raise ImproperlyConfigured(
+        f'A read replica needs REPLICA_PIN_CACHE ({REPLICA_PIN_CACHE!r}) to be a cache shared by all '
+        'workers (set CACHE_URL); LocMemCache is per process.'
+    )
 
 
 # Password validation
@@ -155,6 +277,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
-import os
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Responsive product image renditions (products.images). 'thread' renders
+# them on a background pool after commit; 'sync' renders inline.
+PRODUCT_IMAGE_WIDTHS = [160, 320, 640, 1024]
+PRODUCT_IMAGE_PROCESSING = os.environ.get('PRODUCT_IMAGE_PROCESSING', 'thread')
+PRODUCT_IMAGE_WORKERS = int(os.environ.get('PRODUCT_IMAGE_WORKERS', 2))
+
+# Upload limits for product images (products.uploads)
+PRODUCT_IMAGE_MAX_BYTES = int(os.environ.get('PRODUCT_IMAGE_MAX_BYTES', 5 * 1024 * 1024))
+PRODUCT_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/webp', 'image/gif']
+
+# Units given to products that predate stock tracking, by migration
+# products 0008; sellers adjust them afterwards
+PRODUCTS_BACKFILL_STOCK = int(os.environ.get('PRODUCTS_BACKFILL_STOCK', 1))
+
+# Catalog pagination (GET /api/products/)
+PRODUCTS_PAGE_SIZE = int(os.environ.get('PRODUCTS_PAGE_SIZE', 20))
+PRODUCTS_MAX_PAGE_SIZE = int(os.environ.get('PRODUCTS_MAX_PAGE_SIZE', 100))
+
+# Order history pagination (GET /api/orders/)
+ORDERS_PAGE_SIZE = int(os.environ.get('ORDERS_PAGE_SIZE', 20))
+ORDERS_MAX_PAGE_SIZE = int(os.environ.get('ORDERS_MAX_PAGE_SIZE', 100))
+
+# How long a checkout Idempotency-Key replays its order (seconds); expired
+# keys are removed by `manage.py purge_idempotency_keys`
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Background jobs (tasks app). 'thread' runs the workers inside the web
+# process; 'command' leaves the queue to `manage.py run_tasks`.
+TASKS_MODE = os.environ.get('TASKS_MODE', 'thread')
+TASKS_WORKERS = int(os.environ.get('TASKS_WORKERS', 2))
+TASKS_POLL_INTERVAL = float(os.environ.get('TASKS_POLL_INTERVAL', 1))
+# A claimed job whose worker died becomes due again after this many seconds
+TASKS_LEASE_SECONDS = int(os.environ.get('TASKS_LEASE_SECONDS', 300))
+TASKS_MAX_BACKOFF = int(os.environ.get('TASKS_MAX_BACKOFF', 600))
+
+# Order emails are held this many seconds and sent in batches of up to N
+ORDER_EMAIL_BATCH_WINDOW = float(os.environ.get('ORDER_EMAIL_BATCH_WINDOW', 10))
+ORDER_EMAIL_BATCH_SIZE = int(os.environ.get('ORDER_EMAIL_BATCH_SIZE', 50))
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'pedidos@marketplace.local')
+
+# Dotted path to a products.search backend class; None picks one from the
+# database vendor (FTS5 on SQLite, built-in full-text search on PostgreSQL).
+PRODUCTS_SEARCH_BACKEND = os.environ.get('PRODUCTS_SEARCH_BACKEND') or None
+
+# Rows validated and inserted per transaction by bulk imports, and rows
+# fetched per query by streaming exports (products.bulk)
+PRODUCTS_IMPORT_BATCH_SIZE = int(os.environ.get('PRODUCTS_IMPORT_BATCH_SIZE', 500))
+PRODUCTS_EXPORT_CHUNK_SIZE = int(os.environ.get('PRODUCTS_EXPORT_CHUNK_SIZE', 2000))
+
+# Seconds a serialized product page/detail stays cached (products.cache)
+PRODUCTS_CACHE_TIMEOUT = int(os.environ.get('PRODUCTS_CACHE_TIMEOUT', 300))
+
+# Serialize the hot read endpoints with compiled getters instead of
+# Serializer.data (backend.fastpath); same payload, less CPU
+FAST_SERIALIZERS = os.environ.get('FAST_SERIALIZERS', '1') == '1'
+
+# Per-request query/timing instrumentation (backend.metrics)
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', '1') == '1'
+
+# In-process cache of users resolved from JWTs (users.authentication)
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 1024))
@@ -0,0 +1,325 @@
+import os
+import runpy
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from asgiref.sync import iscoroutinefunction
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products.models import Product
+from .fastpath import compile_serializer
+from .metrics import store
+from .renderers import FastJSONRenderer
+from .routers import pin_key
+
+User = get_user_model()
+
+drf_base_data = serializers.BaseSerializer.__dict__['data']
+
+
+class RequestMetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass12345')
+        cls.user = User.objects.create_user(email='user@example.com', username='user', password='pass12345')
+        cls.product = Product.objects.create(owner=cls.user, title='Mesa', price=40)
+
+    def setUp(self):
+        store.reset()
+
+    def test_server_timing_header(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/orders/')
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="1 queries"', header)
+        self.assertIn('ser;dur=', header)
+        self.assertIn('view;dur=', header)
+
+    def test_aggregates_per_url_name(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.client.get('/api/orders/')
+        self.client.get('/api/cart/my_cart/')
+
+        self.client.force_authenticate(self.admin)
+        data = self.client.get('/api/_metrics').data['endpoints']
+        self.assertEqual(data['GET orders-list']['count'], 3)
+        self.assertEqual(data['GET orders-list']['avg_queries'], 1)
+        self.assertGreater(data['GET orders-list']['serializer_ms'], 0)
+        self.assertEqual(data['GET cart-my-cart']['count'], 1)
+
+    def test_instrumentation_is_scoped_to_requests(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/orders/')
+        self.assertEqual([c.execute_wrappers for c in connections.all()], [[] for _ in connections.all()])
+        # Serializers outside the fast path are left alone
+        self.assertIs(serializers.BaseSerializer.data, drf_base_data)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 401)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 403)
+        self.client.force_authenticate(self.admin)
+        self.assertIn('product_cache', self.client.get('/api/_metrics').data)
+        self.assertEqual(self.client.delete('/api/_metrics').status_code, 204)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Primary and replica are two separate SQLite files with diverging rows."""
+    client_class = APIClient
+
+    @classmethod
+    def setUpClass(cls):
+        # The replica alias only exists for this class, so it is registered
+        # here rather than declared in ``databases`` up front.
+        cls.databases = {'default', 'replica'}
+        cls.tmpdir = tempfile.mkdtemp()
+        connections.settings['replica'] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.tmpdir, 'replica.sqlite3'),
+            'TEST': {**connections.settings['default']['TEST'], 'MIRROR': None},
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        # Pins need a cache every worker sees; a file cache stands in for Redis
+        cls.pin_settings = override_settings(
+            CACHES={
+                **caches.settings,
+                'pins': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': os.path.join(cls.tmpdir, 'pins'),
+                },
+            },
+            REPLICA_PIN_CACHE='pins',
+        )
+        cls.pin_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.pin_settings.disable()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        cache.clear()
+        caches['pins'].clear()
+        for alias, label in (('default', 'Primaria'), ('replica', 'Réplica')):
+            user = User.objects.using(alias).create(id=1, email='buyer@example.com', username='buyer')
+            Product.objects.using(alias).create(id=1, owner=user, title=label, price=10)
+        Order.objects.using('replica').create(user_id=1, total_price=10)
+        self.user = User.objects.get(id=1)
+
+    def get_product_title(self):
+        cache.clear()
+        return self.client.get('/api/products/1/').data['title']
+
+    def test_without_replica_everything_reads_primary(self):
+        self.assertEqual(self.get_product_title(), 'Primaria')
+
+    @override_settings(REPLICA_DATABASE='replica')
+    def test_safe_reads_go_to_replica(self):
+        self.assertEqual(self.get_product_title(), 'Réplica')
+        self.client.force_authenticate(self.user)
+        self.assertEqual(len(self.client.get('/api/orders/').data['results']), 1)
+
+    @override_settings(REPLICA_DATABASE='replica')
+    def test_search_reads_index_and_rows_from_the_same_database(self):
+        response = self.client.get('/api/products/search/', {'q': 'replica'})
+        self.assertEqual([p['title'] for p in response.data['results']], ['Réplica'])
+        self.assertEqual(response.data['count'], 1)
+
+    @override_settings(REPLICA_DATABASE='replica')
+    def test_reads_outside_requests_stay_on_primary(self):
+        self.assertEqual(Product.objects.get(id=1).title, 'Primaria')
+
+    @override_settings(REPLICA_DATABASE='replica', REPLICA_STICKY_SECONDS=60)
+    def test_writer_reads_own_writes_until_window_expires(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/cart/add_item/', {'product_id': 1})
+        self.assertEqual(response.status_code, 201)
+        # Pinned: the order list comes from the primary, which has none
+        self.assertEqual(self.client.get('/api/orders/').data['results'], [])
+        # Anonymous readers are not affected by the pin
+        self.client.force_authenticate(None)
+        self.assertEqual(self.get_product_title(), 'Réplica')
+
+        caches['pins'].delete(pin_key(self.user.id))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(len(self.client.get('/api/orders/').data['results']), 1)
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncReplicaRoutingTests(ReplicaRoutingTests):
+    """The same routing through the native async views."""
+
+
+class ReplicaSettingsTests(SimpleTestCase):
+    def load_settings(self, **env):
+        with mock.patch.dict(os.environ, {'DB_REPLICA_NAME': 'replica.sqlite3', **env}):
+            for name in ('CACHE_URL', 'REPLICA_PIN_CACHE'):
+                if name not in env:
+                    os.environ.pop(name, None)
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'backend', 'settings.py'))
+
+    def test_per_process_pin_cache_is_rejected_at_startup(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings()
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings(CACHE_URL='redis://cache:6379/0', REPLICA_PIN_CACHE='missing')
+
+    def test_shared_pin_cache_is_accepted(self):
+        loaded = self.load_settings(CACHE_URL='redis://cache:6379/0')
+        self.assertEqual(loaded['REPLICA_DATABASE'], 'replica')
+
+
+class AsyncReadViewTests(APITestCase):
+    urls = ['/api/products/', '/api/products/{product}/', '/api/cart/my_cart/', '/api/orders/', '/api/orders/?summary=1']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass12345')
+        cls.product = Product.objects.create(owner=cls.user, title='Lámpara', price=30, stock=3)
+        cart = Cart.objects.create(user=cls.user)
+        CartItem.objects.create(cart=cart, product=cls.product, quantity=2)
+        Cart.objects.filter(pk=cart.pk).refresh_totals()
+        order = Order.objects.create(user=cls.user, total_price=30)
+        OrderItem.objects.create(order=order, product_title='Lámpara', product_price=30, quantity=1, subtotal=30)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_all(self, **headers):
+        responses = []
+        for url in self.urls:
+            cache.clear()
+            responses.append(self.client.get(url.format(product=self.product.id), **headers))
+        return responses
+
+    def test_routes_are_served_by_coroutines(self):
+        for url in self.urls:
+            match = resolve(url.format(product=self.product.id).split('?')[0], urlconf='backend.async_urls')
+            self.assertTrue(iscoroutinefunction(match.func), url)
+
+    def test_payloads_match_the_viewsets(self):
+        self.client.force_authenticate(self.user)
+        expected = self.get_all()
+        with override_settings(ROOT_URLCONF='backend.async_urls'):
+            actual = self.get_all()
+        for before, after in zip(expected, actual):
+            self.assertEqual(after.status_code, 200)
+            self.assertEqual(after.content, before.content)
+            self.assertEqual(after['Content-Type'], before['Content-Type'])
+
+    def test_auth_errors_match_the_viewsets(self):
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer nope'}):
+            expected = self.get_all(**headers)
+            with override_settings(ROOT_URLCONF='backend.async_urls'):
+                actual = self.get_all(**headers)
+            for before, after in zip(expected, actual):
+                self.assertEqual((after.status_code, after.content), (before.status_code, before.content))
+                self.assertEqual(after.get('WWW-Authenticate'), before.get('WWW-Authenticate'))
+
+    @override_settings(ROOT_URLCONF='backend.async_urls')
+    def test_missing_product(self):
+        response = self.client.get('/api/products/999999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data, {'detail': 'No Product matches the given query.'})
+
+    @override_settings(ROOT_URLCONF='backend.async_urls')
+    def test_other_methods_reach_the_viewsets(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/products/', {'title': 'Silla', 'price': '12.00', 'stock': 3})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.patch(f'/api/products/{self.product.id}/', {'price': '31.00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/products/search/', {'q': 'silla'}).data['count'], 1)
+
+    @override_settings(ROOT_URLCONF='backend.async_urls')
+    async def test_asgi_request_with_jwt(self):
+        store.reset()
+        token = str(AccessToken.for_user(self.user))
+        response = await self.async_client.get('/api/orders/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        # Async ORM queries run in worker threads and are still counted
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+        self.assertEqual(store.snapshot()['GET orders-list']['count'], 1)
+
+
+
+class FastPathTests(APITestCase):
+    urls = [
+        '/api/products/', '/api/products/?fields=title,owner', '/api/products/{product}/',
+        '/api/cart/my_cart/', '/api/orders/', '/api/orders/?summary=1',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='buyer@example.com', username='compradora', password='pass12345')
+        cls.product = Product.objects.create(
+            owner=cls.user, title='Lámpara «Ñandú» ☀', description='línea\u2028separada', price=Decimal('19.99'), stock=3,
+        )
+        other = Product.objects.create(owner=cls.user, title='Silla', price=Decimal('0.10'), stock=1)
+        cart = Cart.objects.create(user=cls.user)
+        CartItem.objects.create(cart=cart, product=cls.product, quantity=3)
+        CartItem.objects.create(cart=cart, product=other, quantity=1)
+        Cart.objects.filter(pk=cart.pk).refresh_totals()
+        order = Order.objects.create(user=cls.user, total_price=Decimal('60.07'))
+        OrderItem.objects.create(order=order, product_title='Lámpara', product_price=Decimal('19.99'), quantity=3, subtotal=Decimal('59.97'))
+
+    def fetch_all(self):
+        self.client.force_authenticate(self.user)
+        contents = []
+        for url in self.urls:
+            cache.clear()
+            response = self.client.get(url.format(product=self.product.id))
+            self.assertEqual(response.status_code, 200)
+            contents.append(response.content)
+        return contents
+
+    def test_same_bytes_as_drf(self):
+        with mock.patch('backend.fastpath.compile_serializer', wraps=compile_serializer) as compiled:
+            fast = self.fetch_all()
+        self.assertGreaterEqual(compiled.call_count, len(self.urls))
+        with override_settings(FAST_SERIALIZERS=False), mock.patch('backend.renderers.orjson', None):
+            slow = self.fetch_all()
+        self.assertEqual(fast, slow)
+        self.assertIn(b'\\u2028', fast[0])
+
+    def test_renderer_matches_json_renderer(self):
+        samples = [
+            {'price': Decimal('1.50'), 'at': datetime(2024, 5, 1, 12, tzinfo=dt_timezone.utc), 'text': gettext_lazy('Hola')},
+            {'big': 1e16, 'small': 1e-7, 'total': 59.97},
+            {1: 'clave numérica', 'nested': [{'a': None, 'b': True}]},
+            [],
+        ]
+        for data in samples:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data), data)
+        indented = 'application/json; indent=2'
+        self.assertEqual(FastJSONRenderer().render(samples[2], indented), JSONRenderer().render(samples[2], indented))
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncFastPathTests(FastPathTests):
+    """The same checks against the native async views."""
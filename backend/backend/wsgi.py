@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+from tasks.queue import start_server_workers  # noqa: E402 (needs the app registry)
+
+start_server_workers()
@@ -0,0 +1,115 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from benchmarks import runner
+from benchmarks.seed import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and benchmark the API endpoints in-process. '
+        'Prints p50/p95/p99 latency, queries per request and throughput as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--carts', type=int, default=20)
+        parser.add_argument('--items-per-cart', type=int, default=5)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(runner.SCENARIOS), dest='scenarios',
+            help='Run only this scenario (repeatable).',
+        )
+        parser.add_argument(
+            '--contention', type=int, default=0, metavar='BUYERS',
+            help='Also race this many parallel checkouts for one product (0 = skip).',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=0, metavar='CLIENTS',
+            help='Also compare WSGI threads with the ASGI event loop for this many concurrent clients (0 = skip).',
+        )
+        parser.add_argument('--contention-stock', type=int, default=10, help='Units on sale in the contention run.')
+        parser.add_argument(
+            '--serialization', action='store_true',
+            help='Also time DRF serializers against the compiled fast path on the seeded rows.',
+        )
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request.')
+        parser.add_argument('--output', help='Also write the JSON report to this file.')
+        parser.add_argument('--compare', metavar='BASELINE', help='Flag regressions against a saved report.')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative p95 growth (0.2 = 20%%).')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read baseline: {exc}')
+
+        # Never touch the real database: run against a fresh test database.
+        # Jobs queued by checkouts are left alone, they die with it.
+        setup_test_environment()
+        jobs = override_settings(TASKS_MODE='command')
+        jobs.enable()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            volumes = seed(
+                users=options['users'],
+                products=options['products'],
+                carts=options['carts'],
+                items_per_cart=options['items_per_cart'],
+                orders=options['orders'],
+                items_per_order=options['items_per_order'],
+            )
+            results = runner.run(
+                names=options['scenarios'],
+                requests=options['requests'],
+                warmup=options['warmup'],
+                cold_cache=options['cold_cache'],
+            )
+            contention = None
+            if options['contention']:
+                contention = runner.checkout_contention(options['contention'], options['contention_stock'])
+            serialization = runner.serialization() if options['serialization'] else None
+            concurrency = None
+            if options['concurrency']:
+                concurrency = runner.concurrency(clients=options['concurrency'], requests=options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            jobs.disable()
+            teardown_test_environment()
+
+        report = {'environment': runner.environment(), 'volumes': volumes, 'results': results}
+        if contention is not None:
+            report['contention'] = contention
+        if concurrency is not None:
+            report['concurrency'] = concurrency
+        if serialization is not None:
+            report['serialization'] = serialization
+        rendered = json.dumps(report, indent=2)
+        self.stdout.write(rendered)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(rendered + '\n')
+
+        if contention is not None and (contention['oversold'] or contention['errors']):
+            self.stderr.write(self.style.ERROR(
+                f'CONTENTION oversold {contention["oversold"]} units, {contention["errors"]} errors'
+            ))
+            raise SystemExit(1)
+
+        if baseline is not None:
+            regressions = runner.compare(results, baseline.get('results', {}), options['threshold'])
+            for line in regressions:
+                self.stderr.write(self.style.ERROR(f'REGRESSION {line}'))
+            if regressions:
+                raise SystemExit(1)
+            self.stderr.write(self.style.SUCCESS('No regressions against baseline.'))
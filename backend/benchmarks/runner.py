@@ -0,0 +1,405 @@
+"""Drive the API in-process and collect latency/query statistics."""
+import asyncio
+import itertools
+import platform
+import statistics
+import threading
+import time
+
+import django
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.http.request import HttpHeaders
+from django.test import AsyncClient, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from backend.fastpath import serialize
+from backend.renderers import FastJSONRenderer
+
+from cart.models import Cart, CartItem
+from cart.serializers import CartSerializer
+from cart.views import cart_queryset
+from orders.models import Order, OrderItem
+from orders.serializers import OrderSerializer
+from products.models import Product
+from products.serializers import ProductSerializer
+from .seed import PASSWORD
+
+SCENARIOS = {}
+
+
+def scenario(name, auth=False, requests=None):
+    """Register ``func(client, context, i)`` as a benchmark scenario.
+
+    ``requests`` caps the iterations for inherently slow endpoints (login
+    runs the password hasher on purpose).
+    """
+    def register(func):
+        SCENARIOS[name] = {'func': func, 'auth': auth, 'requests': requests}
+        return func
+    return register
+
+
+@scenario('products_list')
+def products_list(client, context, i):
+    return client.get('/api/products/')
+
+
+@scenario('products_list_compact')
+def products_list_compact(client, context, i):
+    return client.get('/api/products/', {'compact': '1'})
+
+
+@scenario('products_list_fields')
+def products_list_fields(client, context, i):
+    return client.get('/api/products/', {'fields': 'id,title,price,image'})
+
+
+@scenario('products_list_deep')
+def products_list_deep(client, context, i):
+    return client.get(context['deep_products_page'])
+
+
+@scenario('product_detail')
+def product_detail(client, context, i):
+    return client.get(f'/api/products/{context["product_ids"][i % len(context["product_ids"])]}/')
+
+
+@scenario('product_search')
+def product_search(client, context, i):
+    return client.get('/api/products/search/', {'q': context['search_terms'][i % len(context['search_terms'])]})
+
+
+@scenario('cart_my_cart', auth=True)
+def cart_my_cart(client, context, i):
+    return client.get('/api/cart/my_cart/')
+
+
+@scenario('cart_add_item', auth=True)
+def cart_add_item(client, context, i):
+    product_id = context['product_ids'][i % len(context['product_ids'])]
+    return client.post('/api/cart/add_item/', {'product_id': product_id, 'quantity': 1}, content_type='application/json')
+
+
+@scenario('orders_list', auth=True)
+def orders_list(client, context, i):
+    return client.get('/api/orders/')
+
+
+@scenario('orders_summary', auth=True)
+def orders_summary(client, context, i):
+    return client.get('/api/orders/', {'summary': 1})
+
+
+@scenario('users_login', requests=20)
+def users_login(client, context, i):
+    return client.post(
+        '/api/users/login/', {'email': context['email'], 'password': PASSWORD}, content_type='application/json'
+    )
+
+
+def build_context(client):
+    """Pick the benchmark user, log in for a real JWT and precompute URLs."""
+    cart = Cart.objects.select_related('user').order_by('id').first()
+    user = cart.user if cart else Order.objects.select_related('user').first().user
+    response = client.post(
+        '/api/users/login/', {'email': user.email, 'password': PASSWORD}, content_type='application/json'
+    )
+    context = {
+        'email': user.email,
+        'token': response.json()['access'],
+        'product_ids': list(Product.objects.order_by('?').values_list('id', flat=True)[:100]),
+        'search_terms': ['zapatillas', 'reloj cámara', 'mochi', 'silla mesa'],
+    }
+    # Follow the cursor a few pages in to check deep pages cost the same
+    url = '/api/products/'
+    for _ in range(5):
+        next_url = client.get(url).json()['next']
+        if not next_url:
+            break
+        url = next_url
+    context['deep_products_page'] = url
+    return context
+
+
+def percentile(values, pct):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def run_scenario(client, context, func, requests, warmup):
+    for i in range(warmup):
+        func(client, context, i)
+
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for i in range(requests):
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            response = func(client, context, i)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        queries.append(len(ctx))
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'throughput_rps': round(requests / elapsed, 1),
+    }
+
+
+def run(names=None, requests=200, warmup=10, cold_cache=False):
+    """Run the selected scenarios against the current database."""
+    anonymous = Client()
+    context = build_context(anonymous)
+    authenticated = Client(headers={'Authorization': f'Bearer {context["token"]}'})
+
+    results = {}
+    for name in names or SCENARIOS:
+        spec = SCENARIOS[name]
+        cache.clear()
+        client = authenticated if spec['auth'] else anonymous
+        func = spec['func']
+        if cold_cache:
+            func = _uncached(func)
+        count = min(requests, spec['requests'] or requests)
+        results[name] = run_scenario(client, context, func, count, min(warmup, count))
+    return results
+
+
+def _uncached(func):
+    def wrapper(client, context, i):
+        cache.clear()
+        return func(client, context, i)
+    return wrapper
+
+
+def checkout_contention(buyers=50, stock=10, quantity=1):
+    """Race ``buyers`` parallel checkouts for one product holding ``stock`` units.
+
+    Every buyer wants ``quantity`` units, so at most ``stock // quantity``
+    checkouts may succeed; ``oversold`` counts the units sold beyond that
+    and must always be 0. Needs a database shared between threads.
+    """
+    User = get_user_model()
+    seller = User.objects.create(email='contention-seller@example.com', username='contention-seller')
+    product = Product.objects.create(owner=seller, title='Contention', price=10, stock=stock)
+    users = User.objects.bulk_create(
+        User(email=f'contention{i}@example.com', username=f'contention{i}') for i in range(buyers)
+    )
+    carts = Cart.objects.bulk_create(Cart(user=user) for user in users)
+    CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=quantity) for cart in carts)
+    Cart.objects.filter(pk__in=[cart.pk for cart in carts]).refresh_totals()
+
+    barrier = threading.Barrier(buyers)
+    outcomes = []
+
+    def checkout(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            t0 = time.perf_counter()
+            status_code = client.post('/api/cart/checkout/').status_code
+            outcomes.append((status_code, (time.perf_counter() - t0) * 1000))
+        except Exception:
+            outcomes.append((None, 0.0))
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=checkout, args=(user,)) for user in users]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = [status_code for status_code, _ in outcomes]
+    latencies = [ms for status_code, ms in outcomes if status_code is not None] or [0.0]
+    sold = OrderItem.objects.filter(order__user__in=users).aggregate(units=Sum('quantity'))['units'] or 0
+    product.refresh_from_db()
+    return {
+        'buyers': buyers,
+        'stock': stock,
+        'completed': statuses.count(201),
+        'out_of_stock': statuses.count(409),
+        'errors': len(statuses) - statuses.count(201) - statuses.count(409),
+        'units_sold': sold,
+        'stock_left': product.stock,
+        'oversold': max(0, sold - stock),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'wall_ms': round(elapsed * 1000, 3),
+    }
+
+
+CONCURRENCY_SCENARIOS = ['products_list', 'product_detail', 'cart_my_cart', 'orders_list']
+
+
+def concurrency(names=None, clients=32, requests=400):
+    """Serve ``requests`` requests from ``clients`` concurrent clients per deployment.
+
+    ``wsgi`` runs one thread per client through the sync viewsets, like a
+    threaded WSGI worker; ``asgi`` runs every client as a task on a single
+    event loop through backend.async_urls, like one ASGI worker. Needs a
+    database shared between threads.
+    """
+    anonymous = Client()
+    context = build_context(anonymous)
+    headers = {'Authorization': f'Bearer {context["token"]}'}
+
+    results = {}
+    for name in names or CONCURRENCY_SCENARIOS:
+        spec = SCENARIOS[name]
+        scenario_headers = headers if spec['auth'] else {}
+        results[name] = {}
+        for mode, drive, urlconf in (('wsgi', _threaded, 'backend.urls'), ('asgi', _event_loop, 'backend.async_urls')):
+            cache.clear()
+            with override_settings(ROOT_URLCONF=urlconf):
+                results[name][mode] = drive(spec['func'], context, scenario_headers, clients, requests)
+    return results
+
+
+def _threaded(func, context, headers, clients, requests):
+    counter = itertools.count()
+    latencies, statuses = [], []
+
+    def worker():
+        client = Client(headers=headers)
+        try:
+            while (i := next(counter)) < requests:
+                t0 = time.perf_counter()
+                response = func(client, context, i)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return _concurrency_stats(latencies, statuses, time.perf_counter() - started, clients)
+
+
+def _event_loop(func, context, headers, clients, requests):
+    @async_to_sync
+    async def drive():
+        # AsyncClient turns headers= into WSGI names it then fails to map
+        # back; ASGI names in the defaults reach the request as they are.
+        client = AsyncClient(**HttpHeaders.to_asgi_names(headers))
+        counter = itertools.count()
+        latencies, statuses = [], []
+
+        async def worker():
+            while (i := next(counter)) < requests:
+                t0 = time.perf_counter()
+                response = await func(client, context, i)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                statuses.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        return _concurrency_stats(latencies, statuses, time.perf_counter() - started, clients)
+
+    return drive()
+
+
+def _concurrency_stats(latencies, statuses, elapsed, clients):
+    return {
+        'clients': clients,
+        'requests': len(statuses),
+        'errors': sum(status_code >= 400 for status_code in statuses),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'throughput_rps': round(len(statuses) / elapsed, 1),
+    }
+
+
+def serialization(rounds=50):
+    """Time ``Serializer.data`` + JSONRenderer against ``serialize`` + FastJSONRenderer.
+
+    Rows are loaded once up front, so only serializing and rendering are
+    measured; ``identical`` confirms both produce the same bytes.
+    """
+    request = Request(RequestFactory().get('/'))
+    cart = Cart.objects.filter(item_count__gt=0).order_by('id').first()
+    payloads = {
+        'products_page': (ProductSerializer, list(Product.objects.select_related('owner').order_by('id')[:100]), True),
+        'orders_page': (OrderSerializer, list(Order.objects.prefetch_related('items').order_by('id')[:50]), True),
+    }
+    if cart is not None:
+        payloads['cart'] = (CartSerializer, cart_queryset(cart.user).get(), False)
+
+    results = {}
+    for name, (serializer_class, instance, many) in payloads.items():
+        timings = {}
+        for mode, dump, renderer in (
+            ('drf', lambda s: s.data, JSONRenderer()), ('fast', serialize, FastJSONRenderer()),
+        ):
+            samples = []
+            with override_settings(FAST_SERIALIZERS=True):
+                for _ in range(rounds):
+                    t0 = time.perf_counter()
+                    body = renderer.render(dump(serializer_class(instance, many=many, context={'request': request})))
+                    samples.append((time.perf_counter() - t0) * 1000)
+            timings[mode] = (statistics.median(samples), body)
+        drf_ms, drf_body = timings['drf']
+        fast_ms, fast_body = timings['fast']
+        results[name] = {
+            'drf_ms': round(drf_ms, 3),
+            'fast_ms': round(fast_ms, 3),
+            'speedup': round(drf_ms / fast_ms, 2) if fast_ms else None,
+            'bytes': len(fast_body),
+            'identical': fast_body == drf_body,
+        }
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }
+
+
+def compare(current, baseline, threshold=0.2, latency_floor_ms=1.0):
+    """Return human-readable regressions of ``current`` against ``baseline``.
+
+    A scenario regresses when its p95 grows by more than ``threshold``
+    (ignoring differences under ``latency_floor_ms``), when it issues more
+    queries per request, or when it starts returning errors.
+    """
+    regressions = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        limit = before['p95_ms'] * (1 + threshold)
+        if now['p95_ms'] > limit and now['p95_ms'] - before['p95_ms'] > latency_floor_ms:
+            regressions.append(f'{name}: p95 {before["p95_ms"]}ms -> {now["p95_ms"]}ms')
+        if now['queries_per_request'] > before['queries_per_request']:
+            regressions.append(
+                f'{name}: queries/request {before["queries_per_request"]} -> {now["queries_per_request"]}'
+            )
+        if now['errors'] > before['errors']:
+            regressions.append(f'{name}: errors {before["errors"]} -> {now["errors"]}')
+    return regressions
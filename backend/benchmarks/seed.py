@@ -0,0 +1,96 @@
+"""Bulk seeding of users, products, carts and orders for benchmarks."""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem, ProductSalesSummary
+from products.models import Product
+from products.search import get_search_backend
+
+User = get_user_model()
+
+PASSWORD = 'bench-pass-123'
+
+WORDS = [
+    'zapatillas', 'camiseta', 'reloj', 'lámpara', 'mochila', 'auriculares', 'teclado', 'silla',
+    'mesa', 'bicicleta', 'cafetera', 'libro', 'altavoz', 'cámara', 'pulsera', 'chaqueta',
+]
+
+
+def seed(users=20, products=1000, carts=20, items_per_cart=5, orders=200, items_per_order=3,
+         batch_size=1000, random_seed=42):
+    """Insert the requested volumes with bulk_create and return a summary.
+
+    The same arguments always produce the same data, so runs are comparable.
+    """
+    rng = random.Random(random_seed)
+    password = make_password(PASSWORD)
+
+    User.objects.bulk_create(
+        (User(email=f'bench{i}@example.com', username=f'bench{i}', password=password) for i in range(users)),
+        batch_size=batch_size,
+    )
+    user_ids = list(User.objects.filter(email__startswith='bench').order_by('id').values_list('id', flat=True))
+
+    Product.objects.bulk_create(
+        (
+            Product(
+                owner_id=user_ids[i % len(user_ids)],
+                title=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {i}',
+                description=' '.join(rng.choice(WORDS) for _ in range(12)),
+                price=Decimal(rng.randint(100, 50000)) / 100,
+                stock=rng.randint(1, 50),
+            )
+            for i in range(products)
+        ),
+        batch_size=batch_size,
+    )
+    product_rows = list(Product.objects.order_by('id').values_list('id', 'title', 'price', 'owner_id'))
+    get_search_backend().rebuild()
+
+    cart_objects = Cart.objects.bulk_create(Cart(user_id=user_id) for user_id in user_ids[:carts])
+    CartItem.objects.bulk_create(
+        (
+            CartItem(cart=cart, product_id=product_id, quantity=rng.randint(1, 3))
+            for cart in cart_objects
+            for product_id, *_ in rng.sample(product_rows, min(items_per_cart, len(product_rows)))
+        ),
+        batch_size=batch_size,
+    )
+    Cart.objects.filter(pk__in=[cart.pk for cart in cart_objects]).refresh_totals()
+
+    order_lines = []
+    order_objects = []
+    for _ in range(orders):
+        lines = [
+            (product_id, owner_id, title, price, quantity, price * quantity)
+            for product_id, title, price, owner_id in rng.sample(product_rows, min(items_per_order, len(product_rows)))
+            for quantity in [rng.randint(1, 3)]
+        ]
+        order_lines.append(lines)
+        order_objects.append(Order(user_id=rng.choice(user_ids), total_price=sum(line[5] for line in lines)))
+    Order.objects.bulk_create(order_objects, batch_size=batch_size)
+    OrderItem.objects.bulk_create(
+        (
+            OrderItem(
+                order=order, product_id=product_id, seller_id=owner_id, product_title=title,
+                product_price=price, quantity=quantity, subtotal=subtotal,
+            )
+            for order, lines in zip(order_objects, order_lines)
+            for product_id, owner_id, title, price, quantity, subtotal in lines
+        ),
+        batch_size=batch_size,
+    )
+    ProductSalesSummary.objects.rebuild(batch_size=batch_size)
+
+    return {
+        'users': users,
+        'products': products,
+        'carts': carts,
+        'items_per_cart': items_per_cart,
+        'orders': orders,
+        'items_per_order': items_per_order,
+    }
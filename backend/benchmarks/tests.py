@@ -0,0 +1,56 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from products.models import Product
+from . import runner
+from .seed import seed
+
+
+class BenchmarkRunnerTests(TestCase):
+    def test_seed_and_run_smoke(self):
+        volumes = seed(users=3, products=30, carts=2, orders=5)
+        self.assertEqual(Product.objects.count(), volumes['products'])
+        results = runner.run(names=['products_list', 'cart_my_cart', 'orders_summary'], requests=3, warmup=1)
+        for name, stats in results.items():
+            self.assertEqual(stats['errors'], 0, name)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+    def test_serialization_fast_path_is_identical(self):
+        seed(users=3, products=30, carts=2, orders=5)
+        results = runner.serialization(rounds=2)
+        self.assertEqual(sorted(results), ['cart', 'orders_page', 'products_page'])
+        self.assertTrue(all(result['identical'] for result in results.values()))
+
+    def test_compare_flags_regressions(self):
+        baseline = {
+            'a': {'p95_ms': 10.0, 'queries_per_request': 2, 'errors': 0},
+            'b': {'p95_ms': 10.0, 'queries_per_request': 2, 'errors': 0},
+        }
+        current = {
+            'a': {'p95_ms': 11.0, 'queries_per_request': 2, 'errors': 0},
+            'b': {'p95_ms': 20.0, 'queries_per_request': 3, 'errors': 0},
+            'new': {'p95_ms': 99.0, 'queries_per_request': 9, 'errors': 0},
+        }
+        regressions = runner.compare(current, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(line.startswith('b:') for line in regressions))
+
+
+# Queued jobs stay queued: no worker threads on the shared test database
+@override_settings(TASKS_MODE='command')
+class CheckoutContentionTests(TransactionTestCase):
+    def test_parallel_checkouts_never_oversell(self):
+        result = runner.checkout_contention(buyers=8, stock=3)
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual((result['completed'], result['out_of_stock']), (3, 5))
+        self.assertEqual((result['units_sold'], result['stock_left'], result['oversold']), (3, 0, 0))
+
+
+@override_settings(TASKS_MODE='command')
+class ConcurrencyComparisonTests(TransactionTestCase):
+    def test_both_deployments_serve_every_request(self):
+        seed(users=3, products=30, carts=2, orders=5)
+        results = runner.concurrency(clients=4, requests=12)
+        self.assertEqual(sorted(results), sorted(runner.CONCURRENCY_SCENARIOS))
+        for name, modes in results.items():
+            for mode in ('wsgi', 'asgi'):
+                self.assertEqual((modes[mode]['requests'], modes[mode]['errors']), (12, 0), f'{name} {mode}')
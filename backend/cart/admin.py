@@ -3,8 +3,8 @@ from .models import Cart, CartItem
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ['user', 'created_at', 'get_total_price']
-    readonly_fields = ['created_at', 'updated_at']
+    list_display = ['user', 'created_at', 'item_count', 'total_price']
+    readonly_fields = ['created_at', 'updated_at', 'item_count', 'total_price']
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from cart.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Verify the stored cart totals against the cart items and rebuild the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drifted carts; exit with status 1 if any are found.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = list(
+            Cart.objects.with_computed_totals()
+            .filter(~Q(total_price=F('computed_total')) | ~Q(item_count=F('computed_count')))
+            .values_list('id', flat=True)
+        )
+
+        if options['check']:
+            for cart_id in drifted:
+                self.stdout.write(f'Cart {cart_id} has drifted totals.')
+            if drifted:
+                self.stderr.write(self.style.ERROR(f'{len(drifted)} cart(s) out of sync.'))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS('All cart totals are consistent.'))
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(drifted), batch_size):
+            with transaction.atomic():
+                Cart.objects.filter(id__in=drifted[start:start + batch_size]).refresh_totals()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt totals for {len(drifted)} cart(s).'))
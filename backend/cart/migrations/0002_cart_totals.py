@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:38
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    Cart.objects.update(
+        total_price=Coalesce(
+            Subquery(items.annotate(value=Sum(F('quantity') * F('product__price'))).values('value')),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        item_count=Coalesce(Subquery(items.annotate(value=Sum('quantity')).values('value')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
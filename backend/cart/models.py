@@ -1,19 +1,64 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, PositiveIntegerField, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from products.models import Product
 
 User = get_user_model()
 
+
+class CartQuerySet(models.QuerySet):
+    def _item_totals(self):
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        total = items.annotate(
+            value=Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+        ).values('value')
+        count = items.annotate(value=Sum('quantity')).values('value')
+        return (
+            Coalesce(Subquery(total), Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Coalesce(Subquery(count), Value(0), output_field=PositiveIntegerField()),
+        )
+
+    def with_computed_totals(self):
+        """Annotate computed_total/computed_count straight from the items."""
+        total, count = self._item_totals()
+        return self.annotate(computed_total=total, computed_count=count)
+
+    def refresh_totals(self):
+        """Recompute the stored totals from the items in a single UPDATE."""
+        total, count = self._item_totals()
+        return self.update(total_price=total, item_count=count, updated_at=timezone.now())
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Kept in step with the items by every cart mutation (see adjust_totals)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+
+    objects = CartQuerySet.as_manager()
 
     def __str__(self):
         return f"Carrito de {self.user.username}"
 
     def get_total_price(self):
-        return sum(item.get_subtotal() for item in self.items.all())
+        return self.total_price
+
+    def adjust_totals(self, amount, quantity):
+        """Add amount/quantity (possibly negative) to the stored totals.
+
+        Must run in the same transaction as the item change it reflects.
+        """
+        Cart.objects.filter(pk=self.pk).update(
+            total_price=F('total_price') + amount,
+            item_count=F('item_count') + quantity,
+            updated_at=timezone.now(),
+        )
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
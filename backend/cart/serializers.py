@@ -20,7 +20,24 @@ class CartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Cart
-        fields = ['id', 'items', 'total_price']
+        fields = ['id', 'items', 'item_count', 'total_price']
 
     def get_total_price(self, obj):
         return float(obj.get_total_price())
+
+
+class CartOperationSerializer(serializers.Serializer):
+    ADD, SET, REMOVE = 'add', 'set', 'remove'
+
+    op = serializers.ChoiceField(choices=[ADD, SET, REMOVE])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != self.REMOVE and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': 'Este campo es requerido.'})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from products.models import Product
+from .models import Cart
+
+
+@receiver(post_save, sender=Product)
+def refresh_carts_on_price_change(sender, instance, created, **kwargs):
+    if not created:
+        Cart.objects.filter(items__product=instance).refresh_totals()
+
+
+@receiver(pre_delete, sender=Product)
+def remember_carts_with_product(sender, instance, **kwargs):
+    # The cascade removes the cart lines, so collect the carts beforehand
+    instance._affected_cart_ids = list(
+        Cart.objects.filter(items__product=instance).values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def refresh_carts_after_product_delete(sender, instance, **kwargs):
+    cart_ids = getattr(instance, '_affected_cart_ids', None)
+    if cart_ids:
+        Cart.objects.filter(id__in=cart_ids).refresh_totals()
@@ -0,0 +1,439 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from orders.models import IdempotencyKey, Order, OrderItem
+from products.models import Product
+from .models import Cart, CartItem
+
+User = get_user_model()
+
+
+class CartTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.buyer = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass12345')
+        cls.products = Product.objects.bulk_create(
+            Product(owner=cls.seller, title=f'Producto {i}', price=f'{i + 1}.50', stock=50) for i in range(10)
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.buyer)
+
+    def fill_cart(self, count):
+        cart, _ = Cart.objects.get_or_create(user=self.buyer)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=2) for product in self.products[:count]
+        )
+        # bulk_create skips the views, so bring the stored totals in line
+        Cart.objects.filter(pk=cart.pk).refresh_totals()
+        cart.refresh_from_db()
+        return cart
+
+
+class MyCartQueryTests(CartTestMixin, APITestCase):
+    def test_my_cart_query_count_is_independent_of_size(self):
+        for count in (1, 10):
+            CartItem.objects.all().delete()
+            self.fill_cart(count)
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/cart/my_cart/')
+            self.assertEqual(len(response.data['items']), count)
+
+    def test_my_cart_totals(self):
+        self.fill_cart(3)
+        response = self.client.get('/api/cart/my_cart/')
+        # (1.50 + 2.50 + 3.50) * 2
+        self.assertEqual(response.data['total_price'], 15.0)
+        self.assertEqual(response.data['items'][0]['product']['owner'], 'seller')
+
+
+    def test_my_cart_creates_missing_cart(self):
+        self.assertFalse(Cart.objects.filter(user=self.buyer).exists())
+        response = self.client.get('/api/cart/my_cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['items'], [])
+        self.assertTrue(Cart.objects.filter(user=self.buyer).exists())
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncMyCartQueryTests(MyCartQueryTests):
+    """The same checks against the native async views."""
+
+
+class CheckoutTests(CartTestMixin, APITestCase):
+    def test_checkout_creates_order_and_clears_cart(self):
+        cart = self.fill_cart(3)
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_price'], '15.00')
+        self.assertEqual(len(response.data['items']), 3)
+        self.assertFalse(cart.items.exists())
+
+    def test_checkout_empty_cart(self):
+        self.fill_cart(0)
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_query_count_is_independent_of_size(self):
+        counts = []
+        for size in (1, 10):
+            self.fill_cart(size)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/cart/checkout/')
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_failed_checkout_leaves_no_partial_order(self):
+        cart = self.fill_cart(3)
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/api/cart/checkout/')
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 3)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 50)
+
+    def test_checkout_reserves_stock(self):
+        self.fill_cart(2)
+        self.client.post('/api/cart/checkout/')
+        stocks = list(Product.objects.filter(pk__in=[p.pk for p in self.products[:3]]).values_list('stock', flat=True))
+        self.assertEqual(stocks, [48, 48, 50])
+
+    def test_checkout_reports_each_line_out_of_stock(self):
+        cart = self.fill_cart(3)
+        Product.objects.filter(pk=self.products[0].pk).update(stock=1)
+        Product.objects.filter(pk=self.products[2].pk).update(stock=0)
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 409)
+        shortages = {line['product_id']: (line['requested'], line['available']) for line in response.data['items']}
+        self.assertEqual(shortages, {self.products[0].pk: (2, 1), self.products[2].pk: (2, 0)})
+        # Nothing was reserved or ordered
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).stock, 50)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 3)
+
+
+class IdempotentCheckoutTests(CartTestMixin, APITestCase):
+    def checkout(self, key='retry-1'):
+        return self.client.post('/api/cart/checkout/', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_original_order(self):
+        self.fill_cart(2)
+        first = self.checkout()
+        self.assertEqual(first.status_code, 201)
+        # The cart is refilled: a replay must not order it again
+        self.fill_cart(3)
+        with self.assertNumQueries(2):
+            second = self.checkout()
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Cart.objects.get(user=self.buyer).items.count(), 3)
+
+    def test_keys_are_per_user_and_per_checkout(self):
+        self.fill_cart(1)
+        self.checkout('a')
+        self.fill_cart(1)
+        self.assertNotIn('Idempotent-Replayed', self.checkout('b'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_checkout_does_not_consume_key(self):
+        self.assertEqual(self.checkout().status_code, 400)
+        self.fill_cart(1)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_expired_key_places_new_order(self):
+        self.fill_cart(1)
+        self.checkout()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.fill_cart(1)
+        self.assertNotIn('Idempotent-Replayed', self.checkout())
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_invalid_key(self):
+        self.fill_cart(1)
+        self.assertEqual(self.checkout('x' * 300).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class CartMutationTests(CartTestMixin, APITestCase):
+    def test_add_item_creates_then_increments(self):
+        product = self.products[0]
+        response = self.client.post('/api/cart/add_item/', {'product_id': product.id, 'quantity': 2})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/cart/add_item/', {'product_id': product.id, 'quantity': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['quantity'], 5)
+        self.assertEqual(response.data['subtotal'], 7.5)
+
+    def test_add_item_unknown_product(self):
+        response = self.client.post('/api/cart/add_item/', {'product_id': 999999})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post('/api/cart/add_item/', {'product_id': 'abc'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_add_item_invalid_quantity(self):
+        response = self.client.post('/api/cart/add_item/', {'product_id': self.products[0].id, 'quantity': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_and_remove_item(self):
+        item = self.fill_cart(1).items.get()
+        response = self.client.post('/api/cart/update_item/', {'item_id': item.id, 'quantity': 7})
+        self.assertEqual(response.data['quantity'], 7)
+        response = self.client.post('/api/cart/remove_item/', {'item_id': item.id})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/cart/remove_item/', {'item_id': item.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cannot_touch_other_users_items(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+        cart = Cart.objects.create(user=other)
+        item = CartItem.objects.create(cart=cart, product=self.products[0], quantity=1)
+        response = self.client.post('/api/cart/update_item/', {'item_id': item.id, 'quantity': 3})
+        self.assertEqual(response.status_code, 404)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1)
+
+
+class ConcurrentAddItemTests(TransactionTestCase):
+    """Parallel add_item calls for the same line must not lose increments."""
+    threads = 8
+    adds_per_thread = 5
+
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass12345')
+        self.product = Product.objects.create(owner=self.seller, title='Producto', price=1)
+        Cart.objects.create(user=self.buyer)
+
+    def add_items(self, barrier, errors):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        barrier.wait()
+        try:
+            for _ in range(self.adds_per_thread):
+                response = client.post('/api/cart/add_item/', {'product_id': self.product.id})
+                if response.status_code not in (200, 201):
+                    errors.append(response.status_code)
+        finally:
+            connection.close()
+
+    def test_no_lost_increments(self):
+        barrier = threading.Barrier(self.threads)
+        errors = []
+        workers = [
+            threading.Thread(target=self.add_items, args=(barrier, errors)) for _ in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        item = CartItem.objects.get(cart__user=self.buyer, product=self.product)
+        self.assertEqual(item.quantity, self.threads * self.adds_per_thread)
+
+
+class CartBatchTests(CartTestMixin, APITestCase):
+    def batch(self, operations):
+        return self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+
+    def test_applies_operations_in_order(self):
+        self.fill_cart(3)
+        p = self.products
+        response = self.batch([
+            {'op': 'add', 'product_id': p[0].id, 'quantity': 1},
+            {'op': 'set', 'product_id': p[1].id, 'quantity': 5},
+            {'op': 'remove', 'product_id': p[2].id},
+            {'op': 'add', 'product_id': p[3].id, 'quantity': 2},
+            {'op': 'add', 'product_id': p[3].id, 'quantity': 2},
+        ])
+        self.assertEqual(response.status_code, 200)
+        quantities = {item['product']['id']: item['quantity'] for item in response.data['items']}
+        self.assertEqual(quantities, {p[0].id: 3, p[1].id: 5, p[3].id: 4})
+
+    def test_unknown_product_rejects_whole_batch(self):
+        self.fill_cart(1)
+        response = self.batch([
+            {'op': 'set', 'product_id': self.products[0].id, 'quantity': 9},
+            {'op': 'add', 'product_id': 999999, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['product_ids'], [999999])
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_validation(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'op': 'add', 'product_id': self.products[0].id}]).status_code, 400)
+        self.assertEqual(self.batch([{'op': 'drop', 'product_id': self.products[0].id}]).status_code, 400)
+
+    def test_twenty_line_edit_is_a_handful_of_queries(self):
+        products = Product.objects.bulk_create(
+            Product(owner=self.seller, title=f'Extra {i}', price=1) for i in range(10)
+        )
+        self.fill_cart(10)
+        operations = [{'op': 'set', 'product_id': p.id, 'quantity': 3} for p in self.products]
+        operations += [{'op': 'add', 'product_id': p.id, 'quantity': 1} for p in products]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.batch(operations)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), 20)
+        self.assertLessEqual(len(ctx), 10)
+
+
+class CartTotalsTests(CartTestMixin, APITestCase):
+    def assertTotalsConsistent(self, cart):
+        cart = Cart.objects.with_computed_totals().get(pk=cart.pk)
+        self.assertEqual(cart.total_price, cart.computed_total)
+        self.assertEqual(cart.item_count, cart.computed_count)
+        return cart
+
+    def test_totals_follow_every_mutation(self):
+        p = self.products
+        self.client.post('/api/cart/add_item/', {'product_id': p[0].id, 'quantity': 2})
+        self.client.post('/api/cart/add_item/', {'product_id': p[0].id, 'quantity': 1})
+        self.client.post('/api/cart/add_item/', {'product_id': p[1].id, 'quantity': 4})
+        cart = self.assertTotalsConsistent(Cart.objects.get(user=self.buyer))
+        self.assertEqual(cart.item_count, 7)
+
+        item = cart.items.get(product=p[1])
+        self.client.post('/api/cart/update_item/', {'item_id': item.id, 'quantity': 1})
+        self.assertTotalsConsistent(cart)
+        self.client.post('/api/cart/remove_item/', {'item_id': item.id})
+        self.assertTotalsConsistent(cart)
+        self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product_id': p[2].id, 'quantity': 3},
+            {'op': 'set', 'product_id': p[0].id, 'quantity': 1},
+        ]}, format='json')
+        cart = self.assertTotalsConsistent(cart)
+        self.assertEqual(cart.item_count, 4)
+
+        self.client.post('/api/cart/checkout/')
+        cart = self.assertTotalsConsistent(cart)
+        self.assertEqual((cart.total_price, cart.item_count), (0, 0))
+
+    def test_clear_resets_totals(self):
+        cart = self.fill_cart(3)
+        self.client.post('/api/cart/clear/')
+        cart = self.assertTotalsConsistent(cart)
+        self.assertEqual(cart.item_count, 0)
+
+    def test_price_change_and_product_delete_refresh_totals(self):
+        cart = self.fill_cart(2)
+        product = self.products[0]
+        product.price = 100
+        product.save()
+        cart = self.assertTotalsConsistent(cart)
+        self.assertEqual(cart.total_price, Decimal('205.00'))
+        product.delete()
+        cart = self.assertTotalsConsistent(cart)
+        self.assertEqual(cart.total_price, Decimal('5.00'))
+
+    def test_my_cart_reads_stored_totals(self):
+        self.fill_cart(2)
+        response = self.client.get('/api/cart/my_cart/')
+        self.assertEqual(response.data['item_count'], 4)
+        self.assertEqual(response.data['total_price'], 8.0)
+
+
+class RebuildCartTotalsCommandTests(CartTestMixin, APITestCase):
+    def test_check_detects_drift_and_rebuild_fixes_it(self):
+        cart = self.fill_cart(2)
+        Cart.objects.filter(pk=cart.pk).update(total_price=1, item_count=1)
+
+        with self.assertRaises(SystemExit):
+            call_command('rebuild_cart_totals', '--check', stdout=StringIO(), stderr=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_cart_totals', stdout=out)
+        self.assertIn('1 cart(s)', out.getvalue())
+        call_command('rebuild_cart_totals', '--check', stdout=StringIO())
+        cart.refresh_from_db()
+        self.assertEqual((cart.total_price, cart.item_count), (Decimal('8.00'), 4))
+
+
+# Queued jobs stay queued: no worker threads on the shared test database
+@override_settings(TASKS_MODE='command')
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Parallel checkouts must all succeed without "database is locked"."""
+    buyers = 8
+
+    def setUp(self):
+        seller = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        products = Product.objects.bulk_create(
+            Product(owner=seller, title=f'Producto {i}', price=10, stock=self.buyers) for i in range(5)
+        )
+        self.users = []
+        for i in range(self.buyers):
+            user = User.objects.create_user(email=f'buyer{i}@example.com', username=f'buyer{i}', password='pass12345')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=1) for product in products)
+            Cart.objects.filter(pk=cart.pk).refresh_totals()
+            self.users.append(user)
+
+    def checkout(self, user, barrier, statuses, **headers):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            statuses.append(client.post('/api/cart/checkout/', **headers).status_code)
+        except Exception as exc:
+            statuses.append(repr(exc))
+        finally:
+            connection.close()
+
+    def test_parallel_checkouts_complete(self):
+        barrier = threading.Barrier(self.buyers)
+        statuses = []
+        workers = [
+            threading.Thread(target=self.checkout, args=(user, barrier, statuses)) for user in self.users
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(statuses, [201] * self.buyers)
+        self.assertEqual(Order.objects.count(), self.buyers)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertFalse(Product.objects.exclude(stock=0).exists())
+
+    def test_parallel_retries_place_one_order(self):
+        barrier = threading.Barrier(4)
+        statuses = []
+        workers = [
+            threading.Thread(
+                target=self.checkout, args=(self.users[0], barrier, statuses), kwargs={'HTTP_IDEMPOTENCY_KEY': 'k'}
+            )
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(statuses, [201] * 4)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_connections_use_wal(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
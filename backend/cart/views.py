@@ -1,20 +1,33 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer
-from products.models import Product
-from orders.models import Order, OrderItem
+from .serializers import CartSerializer, CartItemSerializer, CartBatchSerializer, CartOperationSerializer
+from products.models import OutOfStock, Product
+from orders.models import IdempotencyKey, Order, OrderItem, ProductSalesSummary
+from orders.tasks import enqueue_order_jobs
+from backend.async_views import api_request, authenticate
+from backend.fastpath import serialize
 from orders.serializers import OrderSerializer
 
+def cart_queryset(user):
+    # Users can only see their own cart. Items, products and owners are
+    # loaded up front so serializing a cart is a fixed number of queries.
+    return Cart.objects.filter(user=user).prefetch_related(
+        Prefetch('items', queryset=CartItem.objects.select_related('product__owner'))
+    )
+
+
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # Users can only see their own cart
-        return Cart.objects.filter(user=self.request.user)
+        return cart_queryset(self.request.user)
 
     def get_object(self):
         # Get or create cart for the current user
@@ -23,9 +36,8 @@ class CartViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def my_cart(self, request):
-        cart = self.get_object()
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        cart, created = self.get_queryset().get_or_create(user=request.user)
+        return Response(serialize(self.get_serializer(cart)))
 
     @action(detail=False, methods=['post'])
     def add_item(self, request):
@@ -34,27 +46,34 @@ class CartViewSet(viewsets.ModelViewSet):
         quantity = request.data.get('quantity', 1)
 
         try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+            product_id = int(product_id)
+        except (ValueError, TypeError):
             return Response({'error': 'Producto no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
         try:
             quantity = int(quantity)
             if quantity <= 0:
                 return Response({'error': 'La cantidad debe ser mayor a 0.'}, status=status.HTTP_400_BAD_REQUEST)
-        except ValueError:
+        except (ValueError, TypeError):
             return Response({'error': 'Cantidad inválida.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get or create cart item, or update quantity if already exists
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
+        # Increment in the database so concurrent adds never lose updates
+        lines = CartItem.objects.filter(cart=cart, product_id=product_id)
+        created = False
+        with transaction.atomic():
+            if not lines.update(quantity=F('quantity') + quantity):
+                if not Product.objects.filter(id=product_id).exists():
+                    return Response({'error': 'Producto no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+                try:
+                    with transaction.atomic():
+                        CartItem.objects.create(cart=cart, product_id=product_id, quantity=quantity)
+                    created = True
+                except IntegrityError:
+                    # Another request created the line in the meantime
+                    lines.update(quantity=F('quantity') + quantity)
 
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+            cart_item = lines.select_related('product__owner').get()
+            cart.adjust_totals(cart_item.product.price * quantity, quantity)
 
         serializer = CartItemSerializer(cart_item)
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -64,12 +83,14 @@ class CartViewSet(viewsets.ModelViewSet):
         cart = self.get_object()
         item_id = request.data.get('item_id')
 
-        try:
-            cart_item = CartItem.objects.get(id=item_id, cart=cart)
-            cart_item.delete()
-            return Response({'message': 'Item removido del carrito.'}, status=status.HTTP_200_OK)
-        except CartItem.DoesNotExist:
-            return Response({'error': 'Item no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            try:
+                cart_item = CartItem.objects.select_for_update().select_related('product').get(id=item_id, cart=cart)
+            except (CartItem.DoesNotExist, ValueError, TypeError):
+                return Response({'error': 'Item no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            CartItem.objects.filter(id=cart_item.id).delete()
+            cart.adjust_totals(-cart_item.get_subtotal(), -cart_item.quantity)
+        return Response({'message': 'Item removido del carrito.'}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def update_item(self, request):
@@ -84,52 +105,209 @@ class CartViewSet(viewsets.ModelViewSet):
         except (ValueError, TypeError):
             return Response({'error': 'Cantidad inválida.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            cart_item = CartItem.objects.get(id=item_id, cart=cart)
+        with transaction.atomic():
+            try:
+                cart_item = (
+                    CartItem.objects.select_for_update().select_related('product__owner').get(id=item_id, cart=cart)
+                )
+            except (CartItem.DoesNotExist, ValueError, TypeError):
+                return Response({'error': 'Item no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            delta = quantity - cart_item.quantity
+            CartItem.objects.filter(id=cart_item.id).update(quantity=quantity)
+            cart.adjust_totals(cart_item.product.price * delta, delta)
             cart_item.quantity = quantity
-            cart_item.save()
-            serializer = CartItemSerializer(cart_item)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except CartItem.DoesNotExist:
-            return Response({'error': 'Item no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = CartItemSerializer(cart_item)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Apply a list of add/set/remove operations and return the cart.
+
+        Operations are applied in order, keyed by product_id, inside one
+        transaction: unknown products reject the whole batch.
+        """
+        payload = CartBatchSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        operations = payload.validated_data['operations']
+        product_ids = {operation['product_id'] for operation in operations}
+
+        cart = self.get_object()
+        with transaction.atomic():
+            prices = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'price'))
+            missing = sorted(product_ids - prices.keys())
+            if missing:
+                return Response(
+                    {'error': 'Producto no encontrado.', 'product_ids': missing},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            lines = {
+                item.product_id: item
+                for item in CartItem.objects.select_for_update().filter(cart=cart, product_id__in=product_ids)
+            }
+            previous = {product_id: item.quantity for product_id, item in lines.items()}
+            quantities = dict(previous)
+            for operation in operations:
+                product_id = operation['product_id']
+                if operation['op'] == CartOperationSerializer.ADD:
+                    quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+                elif operation['op'] == CartOperationSerializer.SET:
+                    quantities[product_id] = operation['quantity']
+                else:
+                    quantities.pop(product_id, None)
+
+            to_create = [
+                CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                for product_id, quantity in quantities.items() if product_id not in lines
+            ]
+            to_update = []
+            for product_id, item in lines.items():
+                if product_id in quantities and quantities[product_id] != item.quantity:
+                    item.quantity = quantities[product_id]
+                    to_update.append(item)
+            to_delete = [item.id for product_id, item in lines.items() if product_id not in quantities]
+
+            if to_create:
+                CartItem.objects.bulk_create(to_create)
+            if to_update:
+                CartItem.objects.bulk_update(to_update, ['quantity'])
+            if to_delete:
+                CartItem.objects.filter(id__in=to_delete).delete()
+
+            count_delta = sum(quantities.values()) - sum(previous.values())
+            total_delta = sum(
+                (quantities.get(product_id, 0) - previous.get(product_id, 0)) * prices[product_id]
+                for product_id in product_ids
+            )
+            cart.adjust_totals(total_delta, count_delta)
+
+        serializer = self.get_serializer(self.get_queryset().get(pk=cart.pk))
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def clear(self, request):
         cart = self.get_object()
-        cart.items.all().delete()
+        with transaction.atomic():
+            cart.items.all().delete()
+            Cart.objects.filter(pk=cart.pk).refresh_totals()
         return Response({'message': 'Carrito vaciado.'}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def checkout(self, request):
-        """Create an order from the current cart items and clear the cart."""
+        """Create an order from the current cart items and clear the cart.
+
+        With an ``Idempotency-Key`` header, repeating a completed checkout
+        returns the original order without touching the cart again.
+        """
+        key = request.headers.get('Idempotency-Key')
+        if key is not None:
+            if not key or len(key) > IdempotencyKey.MAX_LENGTH:
+                return Response({'error': 'Idempotency-Key inválida.'}, status=status.HTTP_400_BAD_REQUEST)
+            order = self.idempotent_order(request.user, key)
+            if order is not None:
+                return self.replay(order)
+
         cart = self.get_object()
-        cart_items = cart.items.all()
 
-        if not cart_items.exists():
-            return Response({'error': 'El carrito está vacío.'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            claimed = None
+            if key is not None:
+                claimed = IdempotencyKey.objects.claim(request.user, key)
+                if claimed is None:
+                    # A concurrent retry with the same key got there first
+                    order = self.idempotent_order(request.user, key)
+                    if order is not None:
+                        return self.replay(order)
+                    return Response(
+                        {'error': 'Este pedido ya se está procesando.'}, status=status.HTTP_409_CONFLICT
+                    )
 
-        # Calculate total price
-        total_price = sum(item.get_subtotal() for item in cart_items)
+            # Single read of the cart lines with their products; everything
+            # below works on this list so nothing is re-queried per line.
+            cart_items = list(cart.items.select_related('product'))
 
-        # Create the order
-        order = Order.objects.create(
-            user=request.user,
-            total_price=total_price
-        )
+            if not cart_items:
+                # Release the key so a retry can still go through
+                transaction.set_rollback(True)
+                return Response({'error': 'El carrito está vacío.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create order items
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product_title=cart_item.product.title,
-                product_price=cart_item.product.price,
-                quantity=cart_item.quantity,
-                subtotal=cart_item.get_subtotal()
+            # One conditional UPDATE reserves every line or none of them
+            try:
+                Product.objects.reserve_stock({cart_item.product_id: cart_item.quantity for cart_item in cart_items})
+            except OutOfStock as exc:
+                transaction.set_rollback(True)
+                return Response(
+                    {
+                        'error': 'No hay stock suficiente para algunos productos.',
+                        'items': [
+                            {
+                                'item_id': cart_item.id,
+                                'product_id': cart_item.product_id,
+                                'product_title': cart_item.product.title,
+                                'requested': cart_item.quantity,
+                                'available': exc.shortages[cart_item.product_id],
+                            }
+                            for cart_item in cart_items if cart_item.product_id in exc.shortages
+                        ],
+                    },
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            order_items = [
+                OrderItem(
+                    product=cart_item.product,
+                    seller_id=cart_item.product.owner_id,
+                    product_title=cart_item.product.title,
+                    product_price=cart_item.product.price,
+                    quantity=cart_item.quantity,
+                    subtotal=cart_item.get_subtotal()
+                )
+                for cart_item in cart_items
+            ]
+            total_price = sum(order_item.subtotal for order_item in order_items)
+
+            order = Order.objects.create(
+                user=request.user,
+                total_price=total_price
             )
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+            ProductSalesSummary.objects.record(order, order_items)
+            if claimed is not None:
+                IdempotencyKey.objects.filter(pk=claimed.pk).update(order=order)
+            # Emails and notifications run in the background once this commits
+            enqueue_order_jobs(order, cart_items)
 
-        # Clear the cart
-        cart_items.delete()
+            # Only clear the lines that made it into the order
+            CartItem.objects.filter(id__in=[cart_item.id for cart_item in cart_items]).delete()
+            cart.adjust_totals(-total_price, -sum(cart_item.quantity for cart_item in cart_items))
 
         serializer = OrderSerializer(order)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def idempotent_order(self, user, key):
+        return (
+            Order.objects.filter(
+                idempotency_keys__user=user, idempotency_keys__key=key,
+                idempotency_keys__expires_at__gt=timezone.now(),
+            )
+            .prefetch_related('items')
+            .first()
+        )
+
+    def replay(self, order):
+        serializer = OrderSerializer(order)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers={'Idempotent-Replayed': 'true'})
+
+
+async def my_cart(request):
+    """Async ``CartViewSet.my_cart`` for the ASGI deployment."""
+    user = await authenticate(request, required=True)
+    cart, created = await cart_queryset(user).aget_or_create(user=user)
+    if created:
+        # A created row has no prefetched items; reading them lazily would
+        # query on the event loop
+        cart = await cart_queryset(user).aget(pk=cart.pk)
+    return Response(serialize(CartSerializer(cart, context={'request': api_request(request)})))
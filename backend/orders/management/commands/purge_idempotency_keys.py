@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout idempotency keys in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        purged = IdempotencyKey.objects.purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired idempotency key(s).'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import ProductSalesSummary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-product sales summary from the order items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = ProductSalesSummary.objects.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Sales summary rebuilt for {written} product(s).'))
@@ -0,0 +1,68 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_sellers(apps, schema_editor):
+    # Linked lines get their product's current owner; unlinked ones stay NULL
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Product = apps.get_model('products', 'Product')
+    OrderItem.objects.using(schema_editor.connection.alias).filter(product__isnull=False).update(
+        seller_id=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('owner_id')[:1])
+    )
+
+
+def copy_summaries(apps, schema_editor):
+    # The new table is built under a temporary name and renamed once the old
+    # one is gone, so no index or constraint name is taken twice
+    Old = apps.get_model('orders', 'ProductSalesSummary')
+    New = apps.get_model('orders', 'SalesSummaryNew')
+    fields = ('product_id', 'owner_id', 'product_title', 'units_sold', 'revenue', 'order_count', 'last_sold_at')
+    New.objects.using(schema_editor.connection.alias).bulk_create(
+        (New(**row) for row in Old.objects.using(schema_editor.connection.alias).values(*fields).iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_product_sales_summary'),
+        ('products', '0009_product_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_sellers, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='SalesSummaryNew',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_title', models.CharField(blank=True, max_length=100)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('last_sold_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('product', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.product')),
+            ],
+        ),
+        migrations.RunPython(copy_summaries, migrations.RunPython.noop),
+        migrations.DeleteModel(name='ProductSalesSummary'),
+        migrations.RenameModel(old_name='SalesSummaryNew', new_name='ProductSalesSummary'),
+        migrations.AlterField(
+            model_name='productsalessummary',
+            name='product',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_summary', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productsalessummary',
+            index=models.Index(fields=['owner', '-revenue'], name='sales_owner_revenue_idx'),
+        ),
+    ]
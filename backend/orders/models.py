@@ -1,5 +1,12 @@
-from django.db import models
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, PositiveIntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -13,6 +20,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the per-user order history pagination
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.user.username}"
@@ -21,6 +32,12 @@ class Order(models.Model):
 class OrderItem(models.Model):
     """Represents an item within an order, stores product info at time of purchase."""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    # The product sold; kept NULL for lines older than the link and for deleted products
+    product = models.ForeignKey(
+        'products.Product', on_delete=models.SET_NULL, null=True, blank=True, related_name='order_items'
+    )
+    # Owner of the product at checkout, so sales still count for them once it is deleted
+    seller = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
     product_title = models.CharField(max_length=100)
     product_price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
@@ -28,3 +45,166 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity}x {self.product_title}"
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def claim(self, user, key):
+        """Record ``key`` for a checkout about to run; None if already taken.
+
+        Call inside the checkout transaction: a concurrent request with the
+        same key waits on the unique constraint until this one finishes.
+        """
+        now = timezone.now()
+        # An expired key can be reused straight away
+        self.filter(user=user, key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                return self.create(
+                    user=user, key=key, expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                )
+        except IntegrityError:
+            return None
+
+    def purge_expired(self, batch_size=1000):
+        """Delete expired keys in batches and return how many were removed."""
+        expired = self.filter(expires_at__lte=timezone.now())
+        purged = 0
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return purged
+            purged += self.filter(pk__in=batch).delete()[0]
+
+
+class IdempotencyKey(models.Model):
+    """An ``Idempotency-Key`` sent to checkout and the order it produced."""
+    MAX_LENGTH = 255
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=MAX_LENGTH)
+    # Set in the same transaction that claims the key
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, related_name='idempotency_keys')
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> Pedido #{self.order_id}"
+
+
+class ProductSalesSummaryQuerySet(models.QuerySet):
+    def record(self, order, order_items):
+        """Add the lines of ``order``, just placed, to their products' totals.
+
+        Call in the checkout transaction with ``order_items`` carrying their
+        ``product``. Missing rows are inserted empty first, so every total
+        then moves in one conditional UPDATE, safe against concurrent
+        checkouts of the same products.
+        """
+        products, units, revenue = {}, {}, {}
+        for item in order_items:
+            if item.product is None:
+                continue
+            products[item.product_id] = item.product
+            units[item.product_id] = units.get(item.product_id, 0) + item.quantity
+            revenue[item.product_id] = revenue.get(item.product_id, 0) + item.subtotal
+        if not products:
+            return
+        self.bulk_create(
+            [
+                ProductSalesSummary(product=product, owner_id=product.owner_id, last_sold_at=order.created_at)
+                for product in products.values()
+            ],
+            ignore_conflicts=True,
+        )
+        self.filter(product_id__in=products).update(
+            units_sold=F('units_sold') + _per_product(units, PositiveIntegerField()),
+            revenue=F('revenue') + _per_product(revenue, DecimalField(max_digits=14, decimal_places=2)),
+            order_count=F('order_count') + 1,
+            product_title=_per_product({pk: p.title for pk, p in products.items()}, models.CharField()),
+            last_sold_at=Greatest('last_sold_at', Value(order.created_at)),
+        )
+
+    def rebuild(self, batch_size=1000):
+        """Recompute every row from the order items; return how many were written.
+
+        Lines of deleted products are summed per seller and title, into
+        rows without a product. Lines with neither product nor seller are
+        older than both links and are left out.
+        """
+        totals = dict(
+            units=Sum('quantity'),
+            total=Sum('subtotal'),
+            orders=Count('order', distinct=True),
+            last=Max('order__created_at'),
+        )
+        live = (
+            OrderItem.objects.filter(product__isnull=False)
+            .values('product_id')
+            .annotate(owner=F('product__owner_id'), title=F('product__title'), **totals)
+            .order_by('product_id')
+        )
+        deleted = (
+            OrderItem.objects.filter(product__isnull=True, seller__isnull=False)
+            .values('seller_id', 'product_title')
+            .annotate(owner=F('seller_id'), title=F('product_title'), **totals)
+            .order_by('seller_id', 'product_title')
+        )
+        written = 0
+        with transaction.atomic():
+            self.all().delete()
+            batch = []
+            for row in chain(live.iterator(chunk_size=batch_size), deleted.iterator(chunk_size=batch_size)):
+                batch.append(ProductSalesSummary(
+                    product_id=row.get('product_id'), owner_id=row['owner'], product_title=row['title'],
+                    units_sold=row['units'], revenue=row['total'], order_count=row['orders'],
+                    last_sold_at=row['last'],
+                ))
+                if len(batch) == batch_size:
+                    written += len(self.bulk_create(batch))
+                    batch = []
+            written += len(self.bulk_create(batch))
+        return written
+
+
+def _per_product(values, output_field):
+    return Case(
+        *(When(product_id=pk, then=Value(value)) for pk, value in values.items()),
+        output_field=output_field,
+    )
+
+
+class ProductSalesSummary(models.Model):
+    """Running sales totals per product, for the seller dashboard.
+
+    Kept current by checkout (``record``) and recomputable from the order
+    items with ``manage.py rebuild_sales_summary``. Owner and title are
+    copied in so the dashboard reads this table alone, and the row outlives
+    its product.
+    """
+    # NULL once the product is deleted
+    product = models.OneToOneField(
+        'products.Product', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_summary'
+    )
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    product_title = models.CharField(max_length=100, blank=True)
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+    last_sold_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ProductSalesSummaryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the per-seller dashboard, best sellers first
+            models.Index(fields=['owner', '-revenue'], name='sales_owner_revenue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_title}: {self.units_sold} uds."
@@ -0,0 +1,11 @@
+from django.conf import settings
+
+from backend.pagination import AsyncCursorPagination
+
+
+class OrderCursorPagination(AsyncCursorPagination):
+    """Newest orders first; served by the order_user_created_idx index."""
+    ordering = ('-created_at', 'id')
+    page_size = settings.ORDERS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.ORDERS_MAX_PAGE_SIZE
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import Order, OrderItem, ProductSalesSummary
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -14,3 +14,25 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['id', 'created_at', 'total_price', 'status', 'items']
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'created_at', 'total_price', 'status', 'item_count']
+
+
+class ProductSalesSummarySerializer(serializers.ModelSerializer):
+    # None once the product has been deleted
+    product_id = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = ProductSalesSummary
+        fields = ['product_id', 'product_title', 'units_sold', 'revenue', 'order_count', 'last_sold_at']
+
+
+class SalesTotalsSerializer(serializers.Serializer):
+    units_sold = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
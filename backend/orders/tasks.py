@@ -0,0 +1,70 @@
+"""Post-checkout jobs, run by the tasks queue.
+
+Both handlers are batched: orders placed within ``ORDER_EMAIL_BATCH_WINDOW``
+seconds of each other share one SMTP connection, and a seller gets a
+single notification covering all of their sales in the batch.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+
+from tasks.queue import enqueue_many, task
+from .models import Order
+
+User = get_user_model()
+
+CONFIRMATION = 'orders.confirmation_email'
+SELLER_NOTIFICATION = 'orders.seller_notification'
+
+
+def enqueue_order_jobs(order, cart_items):
+    """Queue the follow-up work for a just-placed order (one INSERT)."""
+    sales = defaultdict(list)
+    for cart_item in cart_items:
+        sales[str(cart_item.product.owner_id)].append([cart_item.product.title, cart_item.quantity])
+    enqueue_many([
+        (CONFIRMATION, {'order_id': order.pk}),
+        (SELLER_NOTIFICATION, {'order_id': order.pk, 'sales': sales}),
+    ])
+
+
+def send(messages):
+    with get_connection() as connection:
+        connection.send_messages(messages)
+
+
+@task(CONFIRMATION, batch_size=settings.ORDER_EMAIL_BATCH_SIZE, delay=settings.ORDER_EMAIL_BATCH_WINDOW)
+def send_confirmations(payloads):
+    orders = (
+        Order.objects.filter(pk__in=[payload['order_id'] for payload in payloads])
+        .select_related('user').prefetch_related('items')
+    )
+    messages = []
+    for order in orders:
+        lines = '\n'.join(f'{item.quantity}x {item.product_title} - {item.subtotal}€' for item in order.items.all())
+        messages.append(EmailMessage(
+            f'Pedido #{order.pk} confirmado',
+            f'Hola {order.user.username},\n\nHemos recibido tu pedido:\n\n{lines}\n\nTotal: {order.total_price}€',
+            to=[order.user.email],
+        ))
+    send(messages)
+
+
+@task(SELLER_NOTIFICATION, batch_size=settings.ORDER_EMAIL_BATCH_SIZE, delay=settings.ORDER_EMAIL_BATCH_WINDOW)
+def notify_sellers(payloads):
+    sales = defaultdict(list)
+    for payload in payloads:
+        for seller_id, lines in payload['sales'].items():
+            sales[int(seller_id)].extend((payload['order_id'], title, quantity) for title, quantity in lines)
+
+    messages = []
+    for seller in User.objects.filter(pk__in=sales).only('email', 'username'):
+        lines = '\n'.join(f'Pedido #{order_id}: {quantity}x {title}' for order_id, title, quantity in sales[seller.pk])
+        messages.append(EmailMessage(
+            'Has vendido productos',
+            f'Hola {seller.username},\n\nNuevas ventas:\n\n{lines}',
+            to=[seller.email],
+        ))
+    send(messages)
@@ -0,0 +1,230 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from cart.models import Cart, CartItem
+from products.models import Product
+from tasks.models import Task
+from tasks.queue import Worker
+from .models import IdempotencyKey, Order, OrderItem, ProductSalesSummary
+
+User = get_user_model()
+
+
+class OrderHistoryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass12345')
+        other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+        Order.objects.create(user=other, total_price=1)
+        for i in range(12):
+            order = Order.objects.create(user=cls.user, total_price=10)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product_title=f'P{j}', product_price=5, quantity=1, subtotal=5)
+                for j in range(i % 3 + 1)
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list_is_paginated_newest_first(self):
+        response = self.client.get('/api/orders/', {'page_size': 5})
+        results = response.data['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results, sorted(results, key=lambda o: o['created_at'], reverse=True))
+        self.assertIsNotNone(response.data['next'])
+
+    def test_walks_all_own_orders(self):
+        seen, url = [], '/api/orders/?page_size=5'
+        while url:
+            response = self.client.get(url)
+            seen.extend(o['id'] for o in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(Order.objects.filter(user=self.user).values_list('id', flat=True)))
+
+    def test_full_list_prefetches_items(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/', {'page_size': 12})
+        self.assertEqual(sum(len(o['items']) for o in response.data['results']), 24)
+
+    def test_summary_mode_has_item_count_and_no_items(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/', {'summary': 1, 'page_size': 12})
+        order = response.data['results'][0]
+        self.assertNotIn('items', order)
+        self.assertEqual(order['item_count'], Order.objects.get(pk=order['id']).items.count())
+
+    def test_detail_includes_items(self):
+        order = Order.objects.filter(user=self.user).first()
+        response = self.client.get(f'/api/orders/{order.id}/')
+        self.assertEqual(len(response.data['items']), order.items.count())
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncOrderHistoryTests(OrderHistoryTests):
+    """The same checks against the native async views."""
+
+
+class PurgeIdempotencyKeysTests(TestCase):
+    def test_purges_only_expired_keys(self):
+        user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass12345')
+        now = timezone.now()
+        IdempotencyKey.objects.bulk_create(
+            IdempotencyKey(user=user, key=f'old-{i}', expires_at=now - timedelta(hours=1)) for i in range(5)
+        )
+        IdempotencyKey.objects.create(user=user, key='live', expires_at=now + timedelta(hours=1))
+        out = StringIO()
+        call_command('purge_idempotency_keys', '--batch-size', '2', stdout=out)
+        self.assertIn('Purged 5', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['live'])
+
+
+@override_settings(TASKS_MODE='command')
+class OrderJobsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.product = Product.objects.create(owner=cls.seller, title='Mesa', price=40, stock=10)
+        cls.buyers = [
+            User.objects.create_user(email=f'buyer{i}@example.com', username=f'buyer{i}', password='pass12345')
+            for i in range(3)
+        ]
+
+    def checkout(self, buyer):
+        cart = Cart.objects.create(user=buyer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        Cart.objects.filter(pk=cart.pk).refresh_totals()
+        self.client.force_authenticate(buyer)
+        return self.client.post('/api/cart/checkout/')
+
+    def test_checkout_defers_emails_and_batches_them(self):
+        for buyer in self.buyers:
+            self.assertEqual(self.checkout(buyer).status_code, 201)
+        self.assertEqual(Task.objects.count(), 6)
+        self.assertEqual(mail.outbox, [])
+
+        # Jobs wait out the batching window, then go out together
+        self.assertEqual(Worker().drain(), 0)
+        Task.objects.update(run_after=timezone.now())
+        with mock.patch('orders.tasks.get_connection', wraps=mail.get_connection) as connections:
+            Worker().drain()
+        self.assertEqual(connections.call_count, 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [
+            'buyer0@example.com', 'buyer1@example.com', 'buyer2@example.com', 'seller@example.com',
+        ])
+        seller_mail = next(m for m in mail.outbox if m.to == ['seller@example.com'])
+        self.assertEqual(seller_mail.body.count('1x Mesa'), 3)
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_checkout_enqueues_nothing(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=0)
+        self.assertEqual(self.checkout(self.buyers[0]).status_code, 409)
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_MODE='command')
+class SalesSummaryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+        cls.lamp = Product.objects.create(owner=cls.seller, title='Lámpara', price='12.50', stock=20)
+        cls.chair = Product.objects.create(owner=cls.seller, title='Silla', price=40, stock=20)
+        cls.rival = Product.objects.create(owner=cls.other, title='Mesa', price=99, stock=20)
+        cls.buyers = [
+            User.objects.create_user(email=f'buyer{i}@example.com', username=f'buyer{i}', password='pass12345')
+            for i in range(2)
+        ]
+
+    def checkout(self, buyer, *lines):
+        cart, _ = Cart.objects.get_or_create(user=buyer)
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=quantity) for product, quantity in lines)
+        Cart.objects.filter(pk=cart.pk).refresh_totals()
+        self.client.force_authenticate(buyer)
+        self.assertEqual(self.client.post('/api/cart/checkout/').status_code, 201)
+
+    def sell(self):
+        self.checkout(self.buyers[0], (self.lamp, 2), (self.rival, 1))
+        self.checkout(self.buyers[1], (self.lamp, 1), (self.chair, 1))
+
+    def summary(self):
+        return {
+            row['product_id']: row for row in ProductSalesSummary.objects.values(
+                'product_id', 'owner_id', 'product_title', 'units_sold', 'revenue', 'order_count', 'last_sold_at',
+            )
+        }
+
+    def test_checkout_links_items_and_updates_summary(self):
+        self.sell()
+        self.assertEqual(OrderItem.objects.filter(product=self.lamp).count(), 2)
+        lamp = ProductSalesSummary.objects.get(product=self.lamp)
+        self.assertEqual((lamp.units_sold, str(lamp.revenue), lamp.order_count), (3, '37.50', 2))
+        self.assertEqual(lamp.owner, self.seller)
+        self.assertIsNotNone(lamp.last_sold_at)
+
+    def test_rebuild_matches_incremental_totals(self):
+        self.sell()
+        incremental = self.summary()
+        ProductSalesSummary.objects.update(units_sold=0, revenue=0)
+        out = StringIO()
+        call_command('rebuild_sales_summary', stdout=out)
+        self.assertIn('3 product(s)', out.getvalue())
+        self.assertEqual(self.summary(), incremental)
+
+    def test_stats_endpoint_reads_only_the_summary(self):
+        self.sell()
+        self.client.force_authenticate(self.seller)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/products/mine/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all('orders_productsalessummary' in q['sql'] for q in ctx.captured_queries))
+        self.assertNotIn('orders_orderitem', ' '.join(q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(response.data['totals'], {'units_sold': 4, 'revenue': '77.50'})
+        self.assertEqual(
+            [(row['product_title'], row['units_sold'], row['revenue']) for row in response.data['results']],
+            [('Silla', 1, '40.00'), ('Lámpara', 3, '37.50')],
+        )
+
+    def test_stats_are_private(self):
+        self.assertEqual(self.client.get('/api/products/mine/stats/').status_code, 401)
+        self.client.force_authenticate(self.buyers[0])
+        response = self.client.get('/api/products/mine/stats/')
+        self.assertEqual(response.data['totals'], {'units_sold': 0, 'revenue': '0.00'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_deleted_product_keeps_order_history(self):
+        self.sell()
+        self.chair.delete()
+        item = OrderItem.objects.get(product_title='Silla')
+        self.assertIsNone(item.product_id)
+        self.assertEqual(item.seller, self.seller)
+
+    def test_deleted_product_keeps_its_sales(self):
+        self.sell()
+        self.chair.delete()
+        chair = ProductSalesSummary.objects.get(product_title='Silla')
+        self.assertIsNone(chair.product_id)
+        self.assertEqual((chair.owner, chair.units_sold, str(chair.revenue)), (self.seller, 1, '40.00'))
+        self.client.force_authenticate(self.seller)
+        response = self.client.get('/api/products/mine/stats/')
+        self.assertEqual(response.data['totals'], {'units_sold': 4, 'revenue': '77.50'})
+        self.assertEqual(
+            [(row['product_id'], row['product_title'], row['units_sold']) for row in response.data['results']],
+            [(None, 'Silla', 1), (self.lamp.pk, 'Lámpara', 3)],
+        )
+
+    def test_rebuild_keeps_sales_of_deleted_products(self):
+        self.sell()
+        self.chair.delete()
+        incremental = self.summary()
+        call_command('rebuild_sales_summary', stdout=StringIO())
+        self.assertEqual(self.summary(), incremental)
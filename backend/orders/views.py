@@ -1,13 +1,56 @@
+from django.db.models import Count
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
+from backend.async_views import api_request, authenticate
+from backend.fastpath import serialize
 from .models import Order
-from .serializers import OrderSerializer
+from .pagination import OrderCursorPagination
+from .serializers import OrderSerializer, OrderSummarySerializer
 
 
 class OrderViewSet(viewsets.ReadOnlyModelViewSet):
-    """ViewSet for listing user's orders."""
+    """ViewSet for listing user's orders.
+
+    ``?summary=1`` on the list returns only the order headers with an
+    item count, without loading any order items.
+    """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
+
+    def is_summary(self):
+        return self.action == 'list' and is_summary(self.request)
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return order_queryset(self.request.user, self.is_summary())
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return OrderSummarySerializer
+        return OrderSerializer
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(serialize(self.get_serializer(page, many=True)))
+
+
+def is_summary(request):
+    return request.query_params.get('summary') in ('1', 'true')
+
+
+def order_queryset(user, summary):
+    queryset = Order.objects.filter(user=user)
+    if summary:
+        return queryset.annotate(item_count=Count('items'))
+    return queryset.prefetch_related('items')
+
+
+async def order_list(request):
+    """Async ``OrderViewSet.list`` for the ASGI deployment."""
+    user = await authenticate(request, required=True)
+    request = api_request(request)
+    summary = is_summary(request)
+    paginator = OrderCursorPagination()
+    page = await paginator.apaginate_queryset(order_queryset(user, summary), request)
+    serializer_class = OrderSummarySerializer if summary else OrderSerializer
+    return paginator.get_paginated_response(serialize(serializer_class(page, many=True, context={'request': request})))
@@ -0,0 +1,180 @@
+"""Bulk product import and export as CSV or JSON Lines.
+
+Imports read the upload line by line, validate each chunk of rows with the
+rules of ``ProductSerializer`` and insert the valid ones with one
+``bulk_create`` per chunk, each chunk in its own transaction, so memory
+stays flat however long the file is and a bad row only costs itself.
+``bulk_create`` sends no post_save, so each chunk is added to the search
+index and the cached list pages are invalidated here; imported products
+carry no image, so there are no variants to render.
+
+Exports stream ``values_list`` rows from ``.iterator()`` and write them in
+chunks. Under ASGI the response gets an async generator over the same
+iterator, as Django would buffer a synchronous one whole. The columns of
+an export are accepted by the import, which ignores ``id``, ``owner`` and
+``created_at``.
+"""
+import csv
+import json
+from decimal import Decimal
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError, ValidationError
+
+from . import cache as product_cache
+from .models import Product
+from .search import get_search_backend
+from .serializers import ProductSerializer
+
+FORMATS = ('csv', 'jsonl')
+
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+# Content-Type of an import body -> format
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+}
+
+IMPORT_FIELDS = ('title', 'description', 'price', 'stock')
+REQUIRED_COLUMNS = ('title', 'price', 'stock')
+
+EXPORT_FIELDS = ('id', 'owner', 'title', 'description', 'price', 'stock', 'created_at')
+EXPORT_COLUMNS = ('id', 'owner__username', 'title', 'description', 'price', 'stock', 'created_at')
+CSV_HEADER = ','.join(EXPORT_FIELDS) + '\r\n'
+
+# Rows with errors beyond this are counted but not detailed in the report
+MAX_REPORTED_ERRORS = 100
+
+
+def import_format(content_type):
+    """Format of an import body from its Content-Type, or None."""
+    return IMPORT_CONTENT_TYPES.get(content_type.partition(';')[0].strip().lower())
+
+
+def _decoded(stream):
+    # Undecodable bytes become U+FFFD and fail validation of their row only
+    for number, raw in enumerate(stream, 1):
+        yield raw.decode('utf-8-sig' if number == 1 else 'utf-8', errors='replace')
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ParseError(f'Faltan columnas en la cabecera del CSV: {", ".join(missing)}.')
+    for row in reader:
+        # Empty cells are absent values; surplus cells land under None
+        yield reader.line_num, {key: value for key, value in row.items() if key is not None and value not in ('', None)}
+
+
+def _jsonl_rows(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line, parse_float=Decimal)
+        except ValueError:
+            row = None
+        yield number, row
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line, row)`` from a binary line iterable; ``row`` is None if unreadable."""
+    lines = _decoded(stream)
+    return _csv_rows(lines) if fmt == 'csv' else _jsonl_rows(lines)
+
+
+def _validate(serializer, row):
+    if not isinstance(row, dict):
+        raise ValidationError({'non_field_errors': ['La línea no es un objeto JSON válido.']})
+    if any(isinstance(value, str) and '\ufffd' in value for value in row.values()):
+        raise ValidationError({'non_field_errors': ['La línea no está codificada en UTF-8.']})
+    return serializer.run_validation(row)
+
+
+def import_products(owner, rows, batch_size=None):
+    """Create products for ``owner`` from ``(line, row)`` pairs.
+
+    Returns ``{'created', 'failed', 'errors'}`` where ``errors`` lists
+    ``{'line', 'errors'}`` for the first ``MAX_REPORTED_ERRORS`` bad rows.
+    """
+    batch_size = batch_size or settings.PRODUCTS_IMPORT_BATCH_SIZE
+    # One serializer for every row: its fields are built once
+    serializer = ProductSerializer(fields=IMPORT_FIELDS)
+    search = get_search_backend()
+    report = {'created': 0, 'failed': 0, 'errors': []}
+    rows = iter(rows)
+    while chunk := list(islice(rows, batch_size)):
+        products = []
+        for line, row in chunk:
+            try:
+                products.append(Product(owner=owner, **_validate(serializer, row)))
+            except ValidationError as exc:
+                report['failed'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append({'line': line, 'errors': exc.detail})
+        if not products:
+            continue
+        with transaction.atomic():
+            Product.objects.bulk_create(products)
+            search.index(products)
+            transaction.on_commit(product_cache.invalidate_all_lists)
+        report['created'] += len(products)
+    return report
+
+
+def _row_formatter(fmt):
+    created_at = serializers.DateTimeField().to_representation
+
+    def values(row):
+        pk, owner, title, description, price, stock, created = row
+        return pk, owner, title, description, str(price), stock, created_at(created)
+
+    if fmt == 'jsonl':
+        return lambda row: json.dumps(dict(zip(EXPORT_FIELDS, values(row))), ensure_ascii=False) + '\n'
+
+    class Echo:
+        def write(self, value):
+            return value
+
+    writer = csv.writer(Echo())
+    return lambda row: writer.writerow(values(row))
+
+
+def export_lines(queryset, fmt, chunk_size=None):
+    """Yield the export of ``queryset`` in pieces of ``chunk_size`` rows."""
+    chunk_size = chunk_size or settings.PRODUCTS_EXPORT_CHUNK_SIZE
+    line = _row_formatter(fmt)
+    rows = queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        yield CSV_HEADER
+    while chunk := list(islice(rows, chunk_size)):
+        yield ''.join(map(line, chunk))
+
+
+async def aexport_lines(queryset, fmt, chunk_size=None):
+    """``export_lines`` for the ASGI deployment."""
+    chunk_size = chunk_size or settings.PRODUCTS_EXPORT_CHUNK_SIZE
+    line = _row_formatter(fmt)
+    # aiterator() can't be used here: ValuesListIterable runs its query as
+    # soon as it is iterated, i.e. on the event loop
+    rows = queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size)
+    fetch = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    if fmt == 'csv':
+        yield CSV_HEADER
+    while chunk := await fetch():
+        yield ''.join(map(line, chunk))
+
+
+def export_response(queryset, fmt, asynchronous=False):
+    lines = aexport_lines(queryset, fmt) if asynchronous else export_lines(queryset, fmt)
+    response = StreamingHttpResponse(lines, content_type=f'{CONTENT_TYPES[fmt]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+    return response
@@ -0,0 +1,164 @@
+"""Cache of serialized product payloads.
+
+Detail entries are keyed per product and ``?fields=`` selection, list pages
+per query string; both embed a version token that ``invalidate_product``
+replaces, so stale entries are simply never read again and expire on their
+own. Payloads contain absolute image URLs, so the request origin is part
+of every key.
+
+Stock reservations only replace the detail token (``invalidate_detail``):
+checkout traffic would otherwise empty the list cache on every sale, and
+the stock on a cached list page is advisory, as checkout re-checks it.
+
+The ``a``-prefixed functions are the async twins used by the ASGI views.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+LIST_VERSION_KEY = 'products:list:version'
+DETAIL_VERSION_KEY = 'products:detail:{pk}:version'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+async def _aversion(key):
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def _bump(key):
+    cache.set(key, time.time_ns(), None)
+
+
+def _digest(value):
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def _list_key(request, version):
+    return f'products:list:{version}:{_digest(request.build_absolute_uri())}'
+
+
+def _detail_key(request, pk, version):
+    variant = request.build_absolute_uri('/') + request.query_params.get('fields', '')
+    return f'products:detail:{pk}:{version}:{_digest(variant)}'
+
+
+def list_key(request):
+    return _list_key(request, _version(LIST_VERSION_KEY))
+
+
+def detail_key(request, pk):
+    return _detail_key(request, pk, _version(DETAIL_VERSION_KEY.format(pk=pk)))
+
+
+async def alist_key(request):
+    return _list_key(request, await _aversion(LIST_VERSION_KEY))
+
+
+async def adetail_key(request, pk):
+    return _detail_key(request, pk, await _aversion(DETAIL_VERSION_KEY.format(pk=pk)))
+
+
+def invalidate_product(pk):
+    _bump(DETAIL_VERSION_KEY.format(pk=pk))
+    _bump(LIST_VERSION_KEY)
+
+
+def invalidate_detail(pk):
+    # Stock-only changes: list pages keep their (possibly older) stock
+    # until PRODUCTS_CACHE_TIMEOUT rather than being dropped on every sale
+    _bump(DETAIL_VERSION_KEY.format(pk=pk))
+
+
+def invalidate_all_lists():
+    _bump(LIST_VERSION_KEY)
+
+
+def _etag(data):
+    return quote_etag(_digest(json.dumps(data, cls=JSONEncoder, sort_keys=True)))
+
+
+def _respond(request, data, etag):
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    return response
+
+
+def cached_response(request, key, build):
+    """Serve ``key`` from the cache, falling back to ``build()`` on a miss.
+
+    Only 200 responses are stored. Clients sending a matching
+    ``If-None-Match`` get a 304 without a body.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        _count('hits')
+        etag, data = entry
+        return _respond(request, data, etag)
+
+    _count('misses')
+    response = build()
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    etag = _etag(response.data)
+    cache.set(key, (etag, response.data), settings.PRODUCTS_CACHE_TIMEOUT)
+    return _respond(request, response.data, etag)
+
+
+async def acached_response(request, key, build):
+    """``cached_response`` for async views; ``build`` is a coroutine function."""
+    entry = await cache.aget(key)
+    if entry is not None:
+        _count('hits')
+        etag, data = entry
+        return _respond(request, data, etag)
+
+    _count('misses')
+    response = await build()
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    etag = _etag(response.data)
+    await cache.aset(key, (etag, response.data), settings.PRODUCTS_CACHE_TIMEOUT)
+    return _respond(request, response.data, etag)
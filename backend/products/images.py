@@ -0,0 +1,159 @@
+"""Responsive variants of product images, generated off the request path.
+
+When a product is saved with a new image, ``schedule_variants`` queues a job
+on a small thread pool once the transaction commits. The job writes a WebP
+and a JPEG rendition per width in ``settings.PRODUCT_IMAGE_WIDTHS`` next to
+the original and records them in ``Product.image_variants``::
+
+    {"source": "product_images/x.jpg",
+     "webp": {"320": "product_images/variants/x-320.webp", ...},
+     "jpeg": {"320": "product_images/variants/x-320.jpg", ...}}
+
+Variant names derive from the source name only. Uploads are stored under
+their content hash (products.uploads), so products sharing an image share
+its variants: they are rendered once and only deleted with the last user.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from . import cache as product_cache
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PRODUCT_IMAGE_WORKERS, thread_name_prefix='product-images'
+            )
+        return _executor
+
+
+def _submit(func, *args):
+    if settings.PRODUCT_IMAGE_PROCESSING == 'sync':
+        func(*args)
+    else:
+        get_executor().submit(_run_job, func, *args)
+
+
+def _run_job(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Image job %s%r failed', func.__name__, args)
+    finally:
+        # Worker threads hold their own connections; don't leak them
+        connections.close_all()
+
+
+def schedule_variants(product):
+    """Queue (re)generation of the variants if the image changed."""
+    source = product.image.name if product.image else None
+    if (product.image_variants or {}).get('source') == source:
+        return
+    pk = product.pk
+    transaction.on_commit(lambda: _submit(generate_variants, pk, source))
+
+
+def schedule_cleanup(variants):
+    if variant_names(variants):
+        transaction.on_commit(lambda: _submit(release_variants, variants))
+
+
+def release_variants(variants, keep=()):
+    """Delete the files of ``variants`` unless another product still uses them."""
+    if Product.objects.filter(image=variants.get('source')).exists():
+        return
+    delete_files(set(variant_names(variants)) - set(keep))
+
+
+def variant_names(variants):
+    return [name for fmt in FORMATS for name in (variants or {}).get(fmt, {}).values()]
+
+
+def delete_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning('Could not delete image variant %s', name)
+
+
+def render_variants(source_file, widths):
+    """Return {format: {width: bytes}} for ``source_file``; never upscales."""
+    with Image.open(source_file) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    targets = sorted({w for w in widths if w < image.width}) or [image.width]
+    rendered = {fmt: {} for fmt in FORMATS}
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt, (pil_format, _, options) in FORMATS.items():
+            frame = resized.convert('RGB') if pil_format == 'JPEG' and resized.mode != 'RGB' else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+            rendered[fmt][width] = buffer.getvalue()
+    return rendered
+
+
+def generate_variants(pk, source):
+    product = Product.objects.filter(pk=pk).only('image_variants').first()
+    if product is None:
+        return
+    previous = product.image_variants or {}
+    shared = None
+    if source:
+        shared = (
+            Product.objects.filter(image=source, image_variants__source=source)
+            .exclude(pk=pk).values_list('image_variants', flat=True).first()
+        )
+    variants = shared or {'source': source}
+
+    if source and not shared:
+        stem = os.path.splitext(os.path.basename(source))[0]
+        folder = f'{os.path.dirname(source)}/variants'
+        with default_storage.open(source, 'rb') as fh:
+            rendered = render_variants(fh, settings.PRODUCT_IMAGE_WIDTHS)
+        for fmt, by_width in rendered.items():
+            extension = FORMATS[fmt][1]
+            variants[fmt] = {}
+            for width, content in by_width.items():
+                name = f'{folder}/{stem}-{width}.{extension}'
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                variants[fmt][str(width)] = default_storage.save(name, ContentFile(content))
+
+    # Only record the result if the image wasn't replaced in the meantime
+    current = Product.objects.filter(pk=pk)
+    current = current.filter(image=source) if source else current.filter(Q(image__isnull=True) | Q(image=''))
+    if current.update(image_variants=variants):
+        product_cache.invalidate_product(pk)
+        if previous.get('source') != source:
+            release_variants(previous, keep=variant_names(variants))
+    elif not shared:
+        release_variants(variants)
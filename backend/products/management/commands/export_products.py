@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from products.bulk import FORMATS, export_lines
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Stream the catalog as CSV or JSON Lines to a file or stdout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='Defaults to stdout.')
+        parser.add_argument('--owner', help="Only this seller's products (username).")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.order_by('id')
+        if options['owner']:
+            queryset = queryset.filter(owner__username=options['owner'])
+        lines = export_lines(queryset, options['format'], chunk_size=options['chunk_size'])
+        if not options['output']:
+            for piece in lines:
+                self.stdout.write(piece, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f'Exported to {options["output"]}.'))
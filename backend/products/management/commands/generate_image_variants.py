@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from products.images import generate_variants
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive image variants for products that are missing them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate even up-to-date variants.')
+
+    def handle(self, *args, **options):
+        done = 0
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants')
+        for product in products.iterator():
+            if options['all'] or product.image_variants.get('source') != product.image.name:
+                generate_variants(product.pk, product.image.name)
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} product(s).'))
@@ -0,0 +1,43 @@
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import APIException
+
+from products.bulk import FORMATS, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create products for a seller from a CSV or JSON Lines file ("-" reads stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--owner', required=True, help="The seller's email.")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in FORMATS:
+            raise CommandError('Indica --format csv o --format jsonl.')
+        try:
+            owner = get_user_model().objects.get(email=options['owner'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No existe el usuario {options["owner"]}.')
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            report = import_products(owner, read_rows(stream, fmt), batch_size=options['batch_size'])
+        except APIException as exc:
+            raise CommandError(exc.detail)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in report['errors']:
+            self.stderr.write(f'Línea {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {report["created"]} product(s); {report["failed"]} row(s) rejected.'
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_stock(apps, schema_editor):
+    # Products listed before stock existed were sellable; give them
+    # PRODUCTS_BACKFILL_STOCK units instead of leaving them sold out.
+    Product = apps.get_model('products', 'Product')
+    Product.objects.using(schema_editor.connection.alias).update(stock=settings.PRODUCTS_BACKFILL_STOCK)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_stock, migrations.RunPython.noop),
+    ]
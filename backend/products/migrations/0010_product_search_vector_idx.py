@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDEX_NAME = 'product_search_vector_idx'
+
+
+def search_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    # Must stay the expression of products.search.search_vector(), or the
+    # planner can't use the index
+    vector = SearchVector('title', weight='A', config='spanish') + SearchVector(
+        'description', weight='B', config='spanish'
+    )
+    return GinIndex(vector, name=INDEX_NAME)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.add_index(apps.get_model('products', 'Product'), search_index())
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('products', 'Product'), search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,14 +1,91 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
 from django.contrib.auth import get_user_model
 
+from . import cache as product_cache
+
 User = get_user_model()
 
+
+class OutOfStock(Exception):
+    """Raised by ``reserve_stock``; ``shortages`` maps product id to units available."""
+
+    def __init__(self, shortages):
+        super().__init__(shortages)
+        self.shortages = shortages
+
+
+class ProductQuerySet(models.QuerySet):
+    def reserve_stock(self, quantities):
+        """Take ``quantities`` ({product_id: units}) out of stock, all or nothing.
+
+        A single conditional UPDATE decrements every row that still has enough
+        stock, so concurrent checkouts never oversell and no row is locked
+        before the write. If any product falls short the update is rolled
+        back and ``OutOfStock`` reports what is left.
+        """
+        if not quantities:
+            return
+        needed = Case(
+            *(When(pk=pk, then=Value(units)) for pk, units in quantities.items()),
+            output_field=PositiveIntegerField(),
+        )
+        with transaction.atomic():
+            reserved = self.filter(pk__in=quantities, stock__gte=needed).update(stock=F('stock') - needed)
+            if reserved != len(quantities):
+                transaction.set_rollback(True)
+        if reserved != len(quantities):
+            available = dict(self.filter(pk__in=quantities).values_list('pk', 'stock'))
+            raise OutOfStock({
+                pk: available.get(pk, 0) for pk, units in quantities.items() if available.get(pk, 0) < units
+            })
+        transaction.on_commit(lambda: _invalidate(quantities))
+
+    def adjust_stock(self, pk, delta):
+        """Add ``delta`` units (negative to remove) to one product's stock.
+
+        Relative, like ``reserve_stock``, so it never overwrites units taken
+        by concurrent checkouts. Returns the new stock; ``OutOfStock`` if
+        more units would be removed than are left.
+        """
+        with transaction.atomic():
+            updated = self.filter(pk=pk, stock__gte=max(-delta, 0)).update(stock=F('stock') + delta)
+            stock = self.filter(pk=pk).values_list('stock', flat=True).first()
+        if not updated:
+            raise OutOfStock({pk: stock or 0})
+        transaction.on_commit(lambda: _invalidate([pk]))
+        return stock
+
+
+def _invalidate(product_ids):
+    for pk in product_ids:
+        product_cache.invalidate_detail(pk)
+
+
 class Product(models.Model):
-    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products')
+    # Indexed through the owner_* composite indexes below
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products', db_index=False)
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Units available for sale; checkout takes them through reserve_stock
+    stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    # Resized renditions of ``image``, filled in by products.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the cursor pagination of the catalog listing
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            # Catalog filters and orderings (products.filters)
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['owner', 'created_at', 'id'], name='product_owner_created_idx'),
+            models.Index(fields=['owner', 'price', 'id'], name='product_owner_price_idx'),
+        ]
+
     def __str__(self):
         return self.title
@@ -0,0 +1,33 @@
+from django.conf import settings
+from rest_framework.pagination import PageNumberPagination
+
+from backend.pagination import AsyncCursorPagination
+from .filters import product_ordering
+
+
+class ProductCursorPagination(AsyncCursorPagination):
+    """Keyset pagination over (created_at, id) or the ``?ordering=`` picked.
+
+    The default order is backed by product_created_id_idx; see
+    products.filters for the others.
+    """
+    ordering = ('created_at', 'id')
+    page_size = settings.PRODUCTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PRODUCTS_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return product_ordering(request.query_params, self.ordering)
+
+
+class ProductSearchPagination(PageNumberPagination):
+    """Search results are ordered by relevance, so they are paged by number."""
+    page_size = settings.PRODUCTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PRODUCTS_MAX_PAGE_SIZE
+
+
+class ProductStatsPagination(PageNumberPagination):
+    page_size = settings.PRODUCTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PRODUCTS_MAX_PAGE_SIZE
@@ -0,0 +1,182 @@
+"""Full-text search over Product.title / Product.description.
+
+The backend is pluggable through ``settings.PRODUCTS_SEARCH_BACKEND``. When it
+is not set, SQLite databases use an FTS5 index, PostgreSQL uses its built-in
+full-text search and anything else falls back to ``icontains`` lookups.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+FTS_TABLE = 'products_product_fts'
+
+# Title matches weigh more than description matches when ranking
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Text search configuration of the PostgreSQL backend and its GIN index
+SEARCH_CONFIG = 'spanish'
+
+
+def tokenize(query):
+    return _TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    def index(self, products, using='default'):
+        """Add or refresh the given products in the index of database ``using``."""
+
+    def remove(self, product_ids, using='default'):
+        """Drop the given product ids from the index of database ``using``."""
+
+    def rebuild(self):
+        """Re-index the whole catalog."""
+
+    def search(self, query):
+        """Return ranked products matching ``query``.
+
+        The result must support ``count()`` and slicing so it can be handed
+        straight to a Django/DRF paginator.
+        """
+        raise NotImplementedError
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Database-agnostic fallback; scans the table, fine for small catalogs."""
+
+    def search(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return Product.objects.none()
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term)
+        title_hit = Q()
+        for term in terms:
+            title_hit &= Q(title__icontains=term)
+        return (
+            Product.objects.select_related('owner')
+            .filter(condition)
+            .annotate(rank=Case(When(title_hit, then=Value(0)), default=Value(1), output_field=IntegerField()))
+            .order_by('rank', 'id')
+        )
+
+
+def search_vector():
+    """Weighted title/description vector, the expression migration 0010 indexes."""
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector('title', weight='A', config=SEARCH_CONFIG) + SearchVector(
+        'description', weight='B', config=SEARCH_CONFIG
+    )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Uses PostgreSQL full-text search over the GIN index ``product_search_vector_idx``."""
+
+    def search(self, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        if not tokenize(query):
+            return Product.objects.none()
+        vector = search_vector()
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        # Matching with @@ on the indexed expression is what lets the
+        # planner use the index; the rank only orders the matches
+        return (
+            Product.objects.select_related('owner')
+            .alias(document=vector)
+            .filter(document=search_query)
+            .annotate(rank=SearchRank(vector, search_query))
+            .order_by('-rank', 'id')
+        )
+
+
+class SQLiteFTSResults:
+    """Lazy, sliceable view over an FTS5 match, ordered by bm25 rank.
+
+    Only the requested page of rowids is read from the index; the matching
+    products are then fetched by primary key in one query, from the same
+    database as the index so a replica never drops or changes the hits.
+    """
+
+    def __init__(self, match):
+        self.match = match
+        self.using = router.db_for_read(Product)
+
+    def count(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        limit = -1 if key.stop is None else max(key.stop - start, 0)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s OFFSET %s',
+                [self.match, TITLE_WEIGHT, DESCRIPTION_WEIGHT, limit, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        products = Product.objects.using(self.using).select_related('owner').in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """FTS5 virtual table kept in sync from the Product save/delete signals."""
+
+    def index(self, products, using='default'):
+        rows = [(p.id, p.title, p.description) for p in products]
+        if not rows:
+            return
+        with connections[using].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)', rows
+            )
+
+    def remove(self, product_ids, using='default'):
+        with connections[using].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description) '
+                f'SELECT id, title, description FROM {Product._meta.db_table}'
+            )
+
+    def search(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Quote every term so user input can't inject FTS5 syntax, and
+        # prefix-match so "zapat" finds "zapatillas".
+        return SQLiteFTSResults(' '.join(f'"{term}"*' for term in terms))
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, 'PRODUCTS_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return BasicSearchBackend()
@@ -1,9 +1,131 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Product
 
+# Columns each ProductSerializer field reads, for ``?fields=`` querysets
+FIELD_COLUMNS = {
+    'id': ('id',),
+    'owner': ('owner__username',),
+    'title': ('title',),
+    'description': ('description',),
+    'price': ('price',),
+    'stock': ('stock',),
+    'created_at': ('created_at',),
+    'image': ('image',),
+    'image_srcset': ('image', 'image_variants'),
+}
+
+# Always loaded: the cursor paginator reads the ordering columns
+CURSOR_COLUMNS = ('id', 'created_at', 'price')
+
+
 class ProductSerializer(serializers.ModelSerializer):
+    """Full product payload; ``fields=`` keeps only the named fields."""
     owner = serializers.ReadOnlyField(source="owner.username")
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
-        fields = ['id', 'owner', 'title', 'description', 'price', 'created_at', 'image']
+        fields = ['id', 'owner', 'title', 'description', 'price', 'stock', 'created_at', 'image', 'image_srcset']
         read_only_fields = ['id', 'owner', 'created_at']
+        # No silent default: a product created without stock can't be sold
+        extra_kwargs = {'stock': {'required': True}}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        # After creation stock only moves through ProductQuerySet.adjust_stock
+        if self.instance is not None and 'stock' in self.fields:
+            self.fields['stock'].read_only = True
+
+    def validate(self, attrs):
+        if self.instance is not None and 'stock' in getattr(self, 'initial_data', {}):
+            raise serializers.ValidationError(
+                {'stock': ['El stock se ajusta con POST /api/products/<id>/stock/ {"delta": n}.']}
+            )
+        return attrs
+
+    def get_image_srcset(self, obj):
+        """{"webp": "<url> 160w, <url> 320w", "jpeg": ...}; empty until processed."""
+        variants = obj.image_variants or {}
+        if not obj.image or variants.get('source') != obj.image.name:
+            return {}
+        storage = obj.image.storage
+        request = self.context.get('request')
+        srcset = {}
+        for fmt in ('webp', 'jpeg'):
+            entries = []
+            for width, name in sorted(variants.get(fmt, {}).items(), key=lambda item: int(item[0])):
+                url = storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                entries.append(f'{url} {width}w')
+            if entries:
+                srcset[fmt] = ', '.join(entries)
+        return srcset
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    delta = serializers.IntegerField()
+
+    def validate_delta(self, value):
+        if value == 0:
+            raise serializers.ValidationError('Debe ser distinto de 0.')
+        return value
+
+
+class ProductCompactSerializer(serializers.Serializer):
+    """Grid card payload built from ``compact_queryset`` rows."""
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    thumbnail = serializers.SerializerMethodField()
+
+    def get_thumbnail(self, row):
+        """Smallest WebP variant, else the original image, else None."""
+        image = row['image']
+        if not image:
+            return None
+        variants = row['image_variants'] or {}
+        name = image
+        if variants.get('source') == image and variants.get('webp'):
+            name = min(variants['webp'].items(), key=lambda item: int(item[0]))[1]
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+def requested_fields(params):
+    """Parse ``?fields=a,b``; None when absent. Unknown names are a 400."""
+    value = params.get('fields', '').strip()
+    if not value:
+        return None
+    fields = [name for name in dict.fromkeys(part.strip() for part in value.split(',')) if name]
+    unknown = [name for name in fields if name not in FIELD_COLUMNS]
+    if unknown:
+        raise serializers.ValidationError(
+            {'fields': [f'Campos desconocidos: {", ".join(unknown)}. Opciones: {", ".join(FIELD_COLUMNS)}.']}
+        )
+    return fields or None
+
+
+def is_compact(params):
+    return params.get('compact', '').lower() in ('1', 'true')
+
+
+def sparse_queryset(queryset, fields):
+    """Load only the columns ``fields`` needs; join the owner only for ``owner``."""
+    if fields is None:
+        return queryset
+    columns = set(CURSOR_COLUMNS)
+    for name in fields:
+        columns.update(FIELD_COLUMNS[name])
+    if 'owner' not in fields:
+        queryset = queryset.select_related(None)
+    return queryset.only(*columns)
+
+
+def compact_queryset(queryset):
+    return queryset.select_related(None).values(*CURSOR_COLUMNS, 'title', 'image', 'image_variants')
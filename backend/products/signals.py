@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache as product_cache
+from . import images
+from .models import Product
+from .search import get_search_backend
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, using, **kwargs):
+    get_search_backend().index([instance], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, using, **kwargs):
+    get_search_backend().remove([instance.id], using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    product_cache.invalidate_product(instance.id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_owner_products(sender, instance, created, update_fields=None, **kwargs):
+    # Product payloads embed owner.username; logins only touch last_login.
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    for pk in instance.products.values_list('id', flat=True):
+        product_cache.invalidate_product(pk)
+
+
+@receiver(post_save, sender=Product)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Product)
+def delete_image_variants(sender, instance, **kwargs):
+    images.schedule_cleanup(instance.image_variants)
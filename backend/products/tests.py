@@ -1,3 +1,675 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import warnings
+from datetime import timedelta
+from importlib import import_module
+from itertools import combinations
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import cache as product_cache
+from .filters import FILTER_PARAMS, ORDERINGS, filter_products
+from .models import Product
+from .pagination import ProductCursorPagination
+from .search import get_search_backend
+
+User = get_user_model()
+
+
+class ProductPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        Product.objects.bulk_create(
+            Product(owner=cls.owner, title=f'Producto {i}', price=i + 1) for i in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_is_cursor_paginated(self):
+        response = self.client.get('/api/products/', {'page_size': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_walks_whole_catalog_without_duplicates(self):
+        seen = []
+        url = '/api/products/?page_size=10'
+        while url:
+            response = self.client.get(url)
+            seen.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_deep_page_costs_same_queries_as_first(self):
+        first = self.client.get('/api/products/', {'page_size': 5})
+        with self.assertNumQueries(1):
+            self.client.get(first.data['next'])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/products/', {'page_size': 10_000})
+        self.assertLessEqual(len(response.data['results']), ProductCursorPagination.max_page_size)
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncProductPaginationTests(ProductPaginationTests):
+    """The same checks against the native async views."""
+
+
+class ProductFilterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+        now = timezone.now()
+        cls.products = Product.objects.bulk_create([
+            Product(owner=cls.seller, title='Taza', price=5),
+            Product(owner=cls.seller, title='Lámpara', price=30),
+            Product(owner=cls.other, title='Silla', price=30),
+            Product(owner=cls.other, title='Mesa', price=120),
+        ])
+        # created_at is auto_now_add: spread the rows one day apart
+        for days, product in enumerate(reversed(cls.products)):
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(days=days))
+        cls.yesterday = (now - timedelta(days=1)).date()
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [p['title'] for p in response.data['results']]
+
+    def test_price_range(self):
+        self.assertEqual(self.titles(min_price='30'), ['Lámpara', 'Silla', 'Mesa'])
+        self.assertEqual(self.titles(min_price='10', max_price='30.00'), ['Lámpara', 'Silla'])
+
+    def test_owner(self):
+        self.assertEqual(self.titles(owner='other'), ['Silla', 'Mesa'])
+        self.assertEqual(self.titles(owner='nadie'), [])
+
+    def test_created_window(self):
+        self.assertEqual(self.titles(created_after=self.yesterday.isoformat()), ['Silla', 'Mesa'])
+        self.assertEqual(self.titles(created_before=self.yesterday.isoformat()), ['Taza', 'Lámpara'])
+
+    def test_ordering(self):
+        self.assertEqual(self.titles(ordering='-created_at'), ['Mesa', 'Silla', 'Lámpara', 'Taza'])
+        self.assertEqual(self.titles(ordering='-price', owner='seller'), ['Lámpara', 'Taza'])
+
+    def test_cursor_walks_ties_in_price_order(self):
+        seen = []
+        url = '/api/products/?ordering=price&page_size=1'
+        while url:
+            response = self.client.get(url)
+            seen.extend(p['title'] for p in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, ['Taza', 'Lámpara', 'Silla', 'Mesa'])
+
+    def test_invalid_values_are_rejected(self):
+        response = self.client.get('/api/products/', {'min_price': 'barato', 'created_after': 'ayer'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data), ['created_after', 'min_price'])
+        response = self.client.get('/api/products/', {'ordering': 'title'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
+
+    def test_detail_ignores_filters(self):
+        product = self.products[0]
+        response = self.client.get(f'/api/products/{product.id}/', {'min_price': '1000'})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncProductFilterTests(ProductFilterTests):
+    """The same checks against the native async views."""
+
+
+class FilterIndexTests(TestCase):
+    """Every filter combination, under every ordering, must be an index search."""
+    values = {
+        'min_price': '10', 'max_price': '50', 'owner': 'seller',
+        'created_after': '2024-01-01', 'created_before': '2030-01-01',
+    }
+    full_scans = {
+        # "SCAN t USING INDEX" walks an index in order and stops at the LIMIT
+        'sqlite': re.compile(r'SCAN products_product(?! USING)'),
+        'postgresql': re.compile(r'Seq Scan on products_product'),
+    }
+
+    def explain(self, queryset):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        # Tiny test tables are always cheaper to scan; ask whether an index can serve it
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def test_no_full_table_scans(self):
+        full_scan = self.full_scans.get(connection.vendor)
+        if full_scan is None:
+            self.skipTest(f'No plan check for {connection.vendor}')
+        for size in range(1, len(FILTER_PARAMS) + 1):
+            for params in combinations(FILTER_PARAMS, size):
+                queryset = filter_products(Product.objects.select_related('owner'), {p: self.values[p] for p in params})
+                for ordering in ORDERINGS.values():
+                    plan = self.explain(queryset.order_by(*ordering)[:21])
+                    self.assertIsNone(full_scan.search(plan), f'{params} {ordering}:\n{plan}')
+
+
+class ProductFieldsetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        Product.objects.bulk_create(
+            Product(owner=cls.owner, title=f'Producto {i}', description='Descripción larga ' * 20, price=i + 1)
+            for i in range(3)
+        )
+        cls.product = Product.objects.order_by('id').first()
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response, ' '.join(query['sql'] for query in ctx.captured_queries)
+
+    def test_sparse_list_skips_columns_and_owner_join(self):
+        response, sql = self.get('/api/products/', fields='id,title,price')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'price'])
+        self.assertNotIn('users_user', sql)
+        self.assertNotIn('description', sql)
+
+    def test_owner_field_keeps_the_join(self):
+        response, sql = self.get('/api/products/', fields='title,owner')
+        self.assertEqual(response.data['results'][0], {'owner': 'seller', 'title': 'Producto 0'})
+        self.assertIn('users_user', sql)
+
+    def test_sparse_detail_is_cached_per_selection(self):
+        url = f'/api/products/{self.product.id}/'
+        self.assertEqual(self.get(url, fields='price')[0].data, {'price': '1.00'})
+        self.assertEqual(self.get(url)[0].data['title'], 'Producto 0')
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/products/', {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+    def test_compact_list(self):
+        full = self.client.get('/api/products/')
+        response, sql = self.get('/api/products/', compact='1', page_size=2)
+        self.assertEqual(response.data['results'][0], {'id': self.product.id, 'title': 'Producto 0', 'price': '1.00', 'thumbnail': None})
+        self.assertNotIn('users_user', sql)
+        self.assertNotIn('description', sql)
+        self.assertLess(len(response.content) * 3, len(full.content))
+        # Cursors work on the values() rows too
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncProductFieldsetTests(ProductFieldsetTests):
+    """The same checks against the native async views."""
+
+
+class ProductStockTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.product = Product.objects.create(owner=cls.owner, title='Lámpara', price=30, stock=4)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.owner)
+
+    def test_stock_is_required_on_create(self):
+        response = self.client.post('/api/products/', {'title': 'Silla', 'price': '12.00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock', response.data)
+
+    def adjust(self, delta):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/api/products/{self.product.id}/stock/', {'delta': delta})
+
+    def test_adjust_stock_is_relative(self):
+        url = f'/api/products/{self.product.id}/'
+        self.client.get(url)
+        # A checkout between the seller reading and writing is kept
+        Product.objects.reserve_stock({self.product.id: 1})
+        self.assertEqual(self.adjust(5).data, {'stock': 8})
+        self.assertEqual(self.adjust(-8).data, {'stock': 0})
+        self.assertEqual(self.client.get(url).data['stock'], 0)
+
+    def test_cannot_withdraw_more_than_left(self):
+        response = self.adjust(-5)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['stock'], 4)
+        self.assertEqual(self.adjust(0).status_code, 400)
+
+    def test_only_owner_adjusts(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.adjust(5).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.adjust(5).status_code, 401)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 4)
+
+    def test_updates_cannot_overwrite_stock(self):
+        url = f'/api/products/{self.product.id}/'
+        response = self.client.patch(url, {'title': 'Lámpara de pie', 'stock': 50})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock', response.data)
+        response = self.client.patch(url, {'title': 'Lámpara de pie'})
+        self.assertEqual((response.data['title'], response.data['stock']), ('Lámpara de pie', 4))
+
+    @override_settings(PRODUCTS_BACKFILL_STOCK=7)
+    def test_migration_backfills_existing_products(self):
+        migration = import_module('products.migrations.0008_product_stock')
+        Product.objects.update(stock=0)
+        migration.backfill_stock(apps, mock.Mock(connection=connection))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 7)
+
+
+class ProductSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.shoes = Product.objects.create(owner=cls.owner, title='Zapatillas de running', price=60)
+        cls.socks = Product.objects.create(
+            owner=cls.owner, title='Calcetines', description='Ideales para tus zapatillas', price=5
+        )
+        cls.watch = Product.objects.create(owner=cls.owner, title='Reloj deportivo', price=120)
+
+    def search(self, q, **params):
+        return self.client.get('/api/products/search/', {'q': q, **params})
+
+    def test_title_matches_rank_first(self):
+        response = self.search('zapatillas')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.data['results']], [self.shoes.id, self.socks.id])
+        self.assertEqual(response.data['count'], 2)
+
+    def test_prefix_and_accent_insensitive(self):
+        response = self.search('RELÓ')
+        self.assertEqual([p['id'] for p in response.data['results']], [self.watch.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.watch.title = 'Pulsera inteligente'
+        self.watch.save()
+        self.assertEqual(self.search('reloj').data['count'], 0)
+        self.assertEqual(self.search('pulsera').data['count'], 1)
+        self.shoes.delete()
+        self.assertEqual([p['id'] for p in self.search('zapatillas').data['results']], [self.socks.id])
+
+    def test_results_are_paginated(self):
+        response = self.search('zapatillas', page_size=1)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        response = self.search('"zapatillas OR (')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_query(self):
+        self.assertEqual(self.search('').status_code, 400)
+
+    def test_postgres_search_uses_gin_index(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('The GIN index only exists on PostgreSQL')
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = get_search_backend().search('zapatillas').explain()
+        self.assertIn('product_search_vector_idx', plan)
+
+
+class ProductCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass12345')
+        cls.product = Product.objects.create(owner=cls.owner, title='Lámpara', price=30)
+
+    def setUp(self):
+        cache.clear()
+        product_cache.reset_stats()
+
+    def test_detail_is_served_from_cache(self):
+        url = f'/api/products/{self.product.id}/'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(product_cache.get_stats(), {'hits': 1, 'misses': 1})
+
+    def test_list_is_served_from_cache(self):
+        self.client.get('/api/products/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['title'], 'Lámpara')
+
+    def test_save_invalidates_detail_and_list(self):
+        url = f'/api/products/{self.product.id}/'
+        self.client.get(url)
+        self.client.get('/api/products/')
+        self.product.title = 'Lámpara de pie'
+        self.product.save()
+        self.assertEqual(self.client.get(url).data['title'], 'Lámpara de pie')
+        self.assertEqual(self.client.get('/api/products/').data['results'][0]['title'], 'Lámpara de pie')
+
+    def test_stock_reservation_keeps_list_cache(self):
+        url = f'/api/products/{self.product.id}/'
+        Product.objects.filter(pk=self.product.pk).update(stock=5)
+        self.client.get(url)
+        self.client.get('/api/products/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.reserve_stock({self.product.id: 2})
+        self.assertEqual(self.client.get(url).data['stock'], 3)
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/')
+
+    def test_delete_invalidates(self):
+        self.client.get('/api/products/')
+        self.product.delete()
+        self.assertEqual(self.client.get('/api/products/').data['results'], [])
+
+    def test_owner_rename_invalidates(self):
+        url = f'/api/products/{self.product.id}/'
+        self.client.get(url)
+        self.owner.username = 'vendedora'
+        self.owner.save()
+        self.assertEqual(self.client.get(url).data['owner'], 'vendedora')
+
+    def test_if_none_match_returns_304(self):
+        url = f'/api/products/{self.product.id}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.product.price = 35
+        self.product.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_product_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/products/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/products/999999/').status_code, 404)
+
+    def test_stats_are_admin_only(self):
+        self.assertEqual(self.client.get('/api/products/cache-stats/').status_code, 401)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/products/cache-stats/').data, {'hits': 0, 'misses': 0})
+
+
+@override_settings(ROOT_URLCONF='backend.async_urls')
+class AsyncProductCacheTests(ProductCacheTests):
+    """The same checks against the native async views."""
+
+
+@override_settings(PRODUCT_IMAGE_PROCESSING='sync', PRODUCT_IMAGE_WIDTHS=[64, 128, 4096])
+class ProductImageVariantTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, name='foto.png', size=(800, 400)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'orange').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_product(self):
+        self.client.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/products/', {'title': 'Cuadro', 'price': '20.00', 'stock': 1, 'image': self.upload()}, format='multipart'
+            )
+        self.assertEqual(response.status_code, 201)
+        return Product.objects.get(pk=response.data['id'])
+
+    def test_variants_generated_after_commit(self):
+        product = self.create_product()
+        variants = product.image_variants
+        self.assertEqual(variants['source'], product.image.name)
+        # Never upscales: 4096 is skipped for an 800px original
+        self.assertEqual(sorted(variants['webp']), ['128', '64'])
+        with default_storage.open(variants['jpeg']['128']) as fh, Image.open(fh) as image:
+            self.assertEqual(image.size, (128, 64))
+            self.assertEqual(image.format, 'JPEG')
+
+    def test_serializer_exposes_srcset(self):
+        product = self.create_product()
+        srcset = self.client.get(f'/api/products/{product.id}/').data['image_srcset']
+        self.assertRegex(srcset['webp'], r'^http://testserver/media/\S+-64\.webp 64w, \S+-128\.webp 128w$')
+        self.assertIn('jpeg', srcset)
+
+    def test_compact_thumbnail_is_smallest_variant(self):
+        self.create_product()
+        thumbnail = self.client.get('/api/products/', {'compact': '1'}).data['results'][0]['thumbnail']
+        self.assertRegex(thumbnail, r'^http://testserver/media/\S+-64\.webp$')
+
+    def test_no_srcset_until_processed(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.force_authenticate(self.owner)
+            response = self.client.post(
+                '/api/products/', {'title': 'Cuadro', 'price': '20.00', 'stock': 1, 'image': self.upload()}, format='multipart'
+            )
+        self.assertEqual(response.data['image_srcset'], {})
+
+    def test_replacing_image_regenerates_and_cleans_up(self):
+        product = self.create_product()
+        old = product.image_variants['webp']['64']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/products/{product.id}/', {'image': self.upload('nueva.png', (300, 300))}, format='multipart'
+            )
+        self.assertEqual(response.status_code, 200)
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+        self.assertNotEqual(product.image_variants['webp']['64'], old)
+        self.assertFalse(default_storage.exists(old))
+
+    def test_delete_removes_variants(self):
+        product = self.create_product()
+        names = [product.image_variants['webp']['64'], product.image_variants['jpeg']['128']]
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_upload_is_stored_under_content_hash(self):
+        product = self.create_product()
+        self.assertRegex(product.image.name, r'^product_images/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'product_images', '.incoming')))
+
+    def test_identical_uploads_share_file_and_variants(self):
+        first = self.create_product()
+        with mock.patch('products.images.render_variants') as render:
+            second = self.create_product()
+        render.assert_not_called()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.image_variants, first.image_variants)
+
+        # Variants stay while another product still uses them
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(second.image_variants['webp']['64']))
+
+    @override_settings(PRODUCT_IMAGE_MAX_BYTES=1024)
+    def test_oversized_upload_is_rejected(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(
+            '/api/products/', {'title': 'Cuadro', 'price': '20.00', 'stock': 1, 'image': self.upload()}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Product.objects.exists())
+
+    def test_spoofed_content_type_is_rejected(self):
+        self.client.force_authenticate(self.owner)
+        fake = SimpleUploadedFile('foto.png', b'<?php echo 1; ?>' * 10, content_type='image/png')
+        response = self.client.post(
+            '/api/products/', {'title': 'Cuadro', 'price': '20.00', 'image': fake}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 415)
+
+        pdf = SimpleUploadedFile('doc.pdf', b'%PDF-1.4', content_type='application/pdf')
+        response = self.client.post(
+            '/api/products/', {'title': 'Cuadro', 'price': '20.00', 'image': pdf}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Product.objects.exists())
+
+
+class BulkImportExportTests(APITestCase):
+    CSV = (
+        'title,description,price,stock\r\n'
+        'Lámpara,"Luz cálida, 40W",19.90,3\r\n'
+        'Sin precio,,,1\r\n'
+        'Mesa,,120,0\r\n'
+        ',,5,1\r\n'
+    ).encode()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='seller@example.com', username='seller', password='pass12345')
+        cls.other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.owner)
+
+    def post_import(self, body, content_type='text/csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/products/import/', body, content_type=content_type)
+
+    def export(self, **params):
+        response = self.client.get('/api/products/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_import_creates_valid_rows_and_reports_the_rest(self):
+        response = self.post_import(self.CSV)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 5])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertIn('title', response.data['errors'][1]['errors'])
+
+        lamp = Product.objects.get(title='Lámpara')
+        self.assertEqual((lamp.owner, lamp.description, str(lamp.price), lamp.stock), (self.owner, 'Luz cálida, 40W', '19.90', 3))
+        self.assertEqual(Product.objects.get(title='Mesa').stock, 0)
+
+    def test_imported_products_are_searchable_and_listed(self):
+        self.assertEqual(self.client.get('/api/products/').data['results'], [])
+        self.post_import(self.CSV)
+        self.assertEqual(len(self.client.get('/api/products/').data['results']), 2)
+        results = self.client.get('/api/products/search/', {'q': 'lampara'}).data['results']
+        self.assertEqual([p['title'] for p in results], ['Lámpara'])
+
+    @override_settings(PRODUCTS_IMPORT_BATCH_SIZE=2)
+    def test_rows_are_inserted_in_batches(self):
+        body = '\n'.join(json.dumps({'title': f'Producto {i}', 'price': i + 1, 'stock': 1}) for i in range(5))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_import(body.encode(), 'application/x-ndjson')
+        self.assertEqual(response.data['created'], 5)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "products_product"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_jsonl_reports_unreadable_lines(self):
+        body = (
+            b'{"title": "Taza", "price": 4.5, "stock": 1}\n\nno es json\n[1, 2]\n'
+            b'{"title": "Plato", "price": "3", "stock": 2}\n{"title": "Vaso", "price": 2}\n'
+        )
+        response = self.post_import(body, 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4, 6])
+        self.assertIn('stock', response.data['errors'][2]['errors'])
+        self.assertEqual(str(Product.objects.get(title='Taza').price), '4.50')
+
+    def test_rejects_bad_header_content_type_and_anonymous(self):
+        response = self.post_import(b'name,cost\r\nTaza,4\r\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post_import(b'{}', 'application/json').status_code, 415)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.post_import(self.CSV).status_code, 401)
+        self.assertEqual(self.client.get('/api/products/export/').status_code, 401)
+        self.assertFalse(Product.objects.exists())
+
+    def test_export_round_trips_through_import(self):
+        self.post_import(self.CSV)
+        Product.objects.create(owner=self.other, title='Silla', price=45)
+        exported = self.export(owner='seller')
+        self.assertTrue(exported.startswith('id,owner,title,description,price,stock,created_at\r\n'))
+        self.assertNotIn('Silla', exported)
+
+        self.client.force_authenticate(self.other)
+        response = self.post_import(exported.encode())
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 0))
+        self.assertEqual(
+            sorted(Product.objects.filter(owner=self.other).values_list('title', 'description', 'price', 'stock')),
+            sorted(Product.objects.filter(owner=self.owner).values_list('title', 'description', 'price', 'stock'))
+            + [('Silla', '', 45, 0)],
+        )
+
+    def test_jsonl_export(self):
+        product = Product.objects.create(owner=self.owner, title='Taza', price='4.50', stock=2)
+        rows = [json.loads(line) for line in self.export(**{'as': 'jsonl'}).splitlines()]
+        self.assertEqual(rows, [{
+            'id': product.id, 'owner': 'seller', 'title': 'Taza', 'description': '', 'price': '4.50', 'stock': 2,
+            'created_at': self.client.get(f'/api/products/{product.id}/').data['created_at'],
+        }])
+        self.assertEqual(self.client.get('/api/products/export/', {'as': 'xml'}).status_code, 400)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await Product.objects.acreate(owner=self.owner, title='Taza', price=4)
+        token = str(AccessToken.for_user(self.owner))
+        with warnings.catch_warnings():
+            # Django warns when it has to buffer a sync iterator under ASGI
+            warnings.simplefilter('error')
+            response = await self.async_client.get(
+                '/api/products/export/', {'as': 'jsonl'}, headers={'Authorization': f'Bearer {token}'}
+            )
+            self.assertTrue(response.is_async)
+            body = b''.join([piece async for piece in response.streaming_content])
+        self.assertEqual(json.loads(body)['title'], 'Taza')
+
+    def test_commands(self):
+        path = os.path.join(tempfile.mkdtemp(), 'products.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'wb') as fh:
+            fh.write(self.CSV)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_products', path, owner='seller@example.com', batch_size=1, stdout=out, stderr=err)
+        self.assertIn('Created 2 product(s); 2 row(s) rejected.', out.getvalue())
+        self.assertIn('Línea 3', err.getvalue())
+
+        out = io.StringIO()
+        call_command('export_products', format='jsonl', owner='seller', stdout=out)
+        self.assertEqual(sorted(json.loads(line)['title'] for line in out.getvalue().splitlines()), ['Lámpara', 'Mesa'])
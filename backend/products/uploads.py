@@ -0,0 +1,140 @@
+"""Streaming upload path for product images.
+
+``ProductImageUploadHandler`` replaces Django's memory/temp-file handlers for
+product writes. Each chunk is written straight into a staging file inside
+MEDIA_ROOT while a SHA-256 is computed, so nothing is buffered in memory
+and the final save is a rename. Oversized bodies are rejected from the
+Content-Length before any byte is read, and the real file type is sniffed
+from its first bytes. ``store_image`` then files the upload under its
+content hash so identical images are stored (and processed) only once.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Allowance for multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+    (b'GIF87a', 'image/gif', '.gif'),
+    (b'GIF89a', 'image/gif', '.gif'),
+)
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'La imagen supera el tamaño máximo permitido.'
+    default_code = 'image_too_large'
+
+
+class UnsupportedImageType(APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = 'Tipo de imagen no permitido.'
+    default_code = 'unsupported_image_type'
+
+
+def sniff(head):
+    """Return (content_type, extension) from the leading bytes, or None."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp', '.webp'
+    for signature, content_type, extension in SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    return None
+
+
+def staging_dir():
+    location = getattr(default_storage, 'location', None)
+    path = os.path.join(location, 'product_images', '.incoming') if location else settings.FILE_UPLOAD_TEMP_DIR
+    if path:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+class HashedUploadedFile(UploadedFile):
+    """A staged upload that knows its SHA-256 and sniffed type."""
+
+    def __init__(self, file, name, content_type, size, charset, sha256, extension, content_type_extra=None):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = sha256
+        self.extension = extension
+
+    def temporary_file_path(self):
+        # Lets FileSystemStorage move the staged file instead of copying it
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Already moved into place by the storage
+            pass
+
+
+class ProductImageUploadHandler(FileUploadHandler):
+    chunk_size = 64 * 1024
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = settings.PRODUCT_IMAGE_MAX_BYTES
+        self.allowed_types = set(settings.PRODUCT_IMAGE_TYPES)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > self.max_bytes + MULTIPART_OVERHEAD:
+            raise ImageTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_type not in self.allowed_types:
+            raise UnsupportedImageType()
+        self.file = tempfile.NamedTemporaryFile(dir=staging_dir(), suffix='.upload')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.detected = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.detected is None:
+            self.detected = sniff(raw_data)
+            if self.detected is None or self.detected[0] not in self.allowed_types:
+                self.file.close()
+                raise UnsupportedImageType()
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self.file.close()
+            raise ImageTooLarge()
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        content_type, extension = self.detected or (self.content_type, '')
+        return HashedUploadedFile(
+            self.file, self.file_name, content_type, file_size, self.charset,
+            self.digest.hexdigest(), extension, self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+def store_image(upload):
+    """Save ``upload`` under its content hash and return the storage name.
+
+    An identical image that is already stored is reused as-is.
+    """
+    name = f'product_images/{upload.sha256[:2]}/{upload.sha256}{upload.extension}'
+    if default_storage.exists(name):
+        upload.close()
+        return name
+    return default_storage.save(name, upload)
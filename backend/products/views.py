@@ -1,19 +1,205 @@
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
-from .models import Product
-from .serializers import ProductSerializer
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly, IsAdminUser
+from .models import OutOfStock, Product
+from .serializers import (
+    ProductCompactSerializer, ProductSerializer, StockAdjustmentSerializer, compact_queryset, is_compact,
+    requested_fields, sparse_queryset,
+)
 from .permissions import IsOwnerOrReadOnly
+from .pagination import ProductCursorPagination, ProductSearchPagination, ProductStatsPagination
+from .filters import ProductFilterBackend, filter_products
+from .search import get_search_backend
+from . import bulk, cache as product_cache
+from .uploads import HashedUploadedFile, ProductImageUploadHandler, store_image
+from backend.async_views import api_request, authenticate
+from backend.fastpath import serialize
+from orders.models import ProductSalesSummary
+from orders.serializers import ProductSalesSummarySerializer, SalesTotalsSerializer
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('owner')
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
+    filter_backends = [ProductFilterBackend]
 
     def get_permissions(self):
+        if self.action == 'cache_stats':
+            return [IsAdminUser()]
+        if self.action in ('sales_stats', 'bulk_import', 'bulk_export'):
+            return [IsAuthenticated()]
+        if self.action == 'adjust_stock':
+            return [IsAuthenticated(), IsOwnerOrReadOnly()]
         if self.request.method in ["GET", "HEAD", "OPTIONS"]:
             return [AllowAny()]
         if self.request.method == "POST":
             return [IsAuthenticated()]
         return [IsAuthenticated(), IsOwnerOrReadOnly()]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if self.action == 'list' and is_compact(params):
+            return compact_queryset(queryset)
+        if self.action in ('list', 'retrieve'):
+            return sparse_queryset(queryset, requested_fields(params))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        params = self.request.query_params
+        if self.action == 'list' and is_compact(params):
+            kwargs.setdefault('context', self.get_serializer_context())
+            return ProductCompactSerializer(*args, **kwargs)
+        if self.action in ('list', 'retrieve'):
+            kwargs['fields'] = requested_fields(params)
+        return super().get_serializer(*args, **kwargs)
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Stream image uploads to storage instead of buffering them
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            request.upload_handlers = [ProductImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def stored_image(self, serializer):
+        image = serializer.validated_data.get('image')
+        if isinstance(image, HashedUploadedFile):
+            return {'image': store_image(image)}
+        return {}
+
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        serializer.save(owner=self.request.user, **self.stored_image(serializer))
+
+    def perform_update(self, serializer):
+        serializer.save(**self.stored_image(serializer))
+
+    def list(self, request, *args, **kwargs):
+        return product_cache.cached_response(request, product_cache.list_key(request), self.build_list)
+
+    def retrieve(self, request, *args, **kwargs):
+        return product_cache.cached_response(request, product_cache.detail_key(request, kwargs['pk']), self.build_detail)
+
+    def build_list(self):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(serialize(self.get_serializer(page, many=True)))
+
+    def build_detail(self):
+        return Response(serialize(self.get_serializer(self.get_object())))
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over title and description, ranked by relevance."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'El parámetro q es obligatorio.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = ProductSearchPagination()
+        page = paginator.paginate_queryset(get_search_backend().search(query), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['post'], url_path='stock')
+    def adjust_stock(self, request, pk=None):
+        """Add or remove units: ``{"delta": 5}`` restocks, ``{"delta": -2}`` withdraws."""
+        product = self.get_object()
+        serializer = StockAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            stock = Product.objects.adjust_stock(product.pk, serializer.validated_data['delta'])
+        except OutOfStock as exc:
+            return Response(
+                {'error': 'No quedan tantas unidades.', 'stock': exc.shortages[product.pk]},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response({'stock': stock})
+
+    @action(detail=False, methods=['get'], url_path='mine/stats')
+    def sales_stats(self, request):
+        """Units sold and revenue of the caller's products, best sellers first.
+
+        Reads only ProductSalesSummary, never the orders.
+        """
+        summaries = ProductSalesSummary.objects.filter(owner=request.user)
+        totals = summaries.aggregate(
+            units_sold=Coalesce(Sum('units_sold'), 0),
+            revenue=Coalesce(Sum('revenue'), Value(Decimal(0)), output_field=DecimalField()),
+        )
+        paginator = ProductStatsPagination()
+        page = paginator.paginate_queryset(summaries.order_by('-revenue', 'id'), request, view=self)
+        response = paginator.get_paginated_response(ProductSalesSummarySerializer(page, many=True).data)
+        response.data['totals'] = SalesTotalsSerializer(totals).data
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Create the caller's products from a CSV or JSON Lines body.
+
+        The body is read as a stream; rows that fail validation are reported
+        by line and the rest are created.
+        """
+        fmt = bulk.import_format(request.content_type)
+        if fmt is None:
+            return Response(
+                {'error': 'El cuerpo debe ser text/csv o application/x-ndjson.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        report = bulk.import_products(request.user, bulk.read_rows(request._request, fmt))
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def bulk_export(self, request):
+        """Stream the catalog (``?as=csv|jsonl``) with the list filters applied."""
+        fmt = request.query_params.get('as', 'csv')
+        if fmt not in bulk.FORMATS:
+            return Response({'error': 'Formato no válido. Opciones: csv, jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filter_products(Product.objects.order_by('id'), request.query_params)
+        return bulk.export_response(queryset, fmt, asynchronous=isinstance(request._request, ASGIRequest))
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        return Response(product_cache.get_stats())
+
+
+async def product_list(request):
+    """Async ``ProductViewSet.list`` for the ASGI deployment."""
+    await authenticate(request)
+    request = api_request(request)
+
+    async def build():
+        params = request.query_params
+        paginator = ProductCursorPagination()
+        if is_compact(params):
+            queryset = compact_queryset(ProductViewSet.queryset.all())
+            serializer_class, kwargs = ProductCompactSerializer, {}
+        else:
+            fields = requested_fields(params)
+            queryset = sparse_queryset(ProductViewSet.queryset.all(), fields)
+            serializer_class, kwargs = ProductSerializer, {'fields': fields}
+        page = await paginator.apaginate_queryset(filter_products(queryset, params), request)
+        serializer = serializer_class(page, many=True, context={'request': request}, **kwargs)
+        return paginator.get_paginated_response(serialize(serializer))
+
+    return await product_cache.acached_response(request, await product_cache.alist_key(request), build)
+
+
+async def product_detail(request, pk):
+    """Async ``ProductViewSet.retrieve`` for the ASGI deployment."""
+    await authenticate(request)
+    request = api_request(request)
+
+    async def build():
+        fields = requested_fields(request.query_params)
+        try:
+            product = await sparse_queryset(ProductViewSet.queryset.all(), fields).aget(pk=pk)
+        except (Product.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404('No Product matches the given query.')
+        return Response(serialize(ProductSerializer(product, fields=fields, context={'request': request})))
+
+    return await product_cache.acached_response(request, await product_cache.adetail_key(request, pk), build)
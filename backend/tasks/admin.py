@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import Task
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created_at', 'claimed_by', 'locked_until', 'last_error']
@@ -0,0 +1,40 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.queue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers until interrupted (or drain the queue once with --once).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.TASKS_WORKERS)
+        parser.add_argument('--poll-interval', type=float, default=settings.TASKS_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due now, then exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            ran = Worker().drain()
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} job(s).'))
+            return
+
+        stop = threading.Event()
+        wakeup = threading.Event()
+        workers = [
+            threading.Thread(target=Worker(stop, wakeup).run, args=(options['poll_interval'],), name=f'task-worker-{i}')
+            for i in range(options['threads'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Running {len(workers)} worker thread(s); press Ctrl+C to stop.')
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            wakeup.set()
+            for worker in workers:
+                worker.join()
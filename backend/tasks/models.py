@@ -0,0 +1,54 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class TaskQuerySet(models.QuerySet):
+    def due(self, now=None):
+        """Pending jobs whose time has come, plus running ones whose lease ran out."""
+        now = now or timezone.now()
+        return self.filter(
+            Q(status=Task.PENDING, run_after__lte=now) | Q(status=Task.RUNNING, locked_until__lte=now)
+        )
+
+    def claim(self, name, limit, token, lease_until):
+        """Lock up to ``limit`` due jobs called ``name`` for one worker.
+
+        The conditional UPDATE only takes rows that are still due, so two
+        workers racing for the same jobs never both get them.
+        """
+        due = self.due().filter(name=name)
+        ids = list(due.order_by('run_after', 'id').values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        due.filter(pk__in=ids).update(status=Task.RUNNING, claimed_by=token, locked_until=lease_until)
+        return list(self.filter(pk__in=ids, claimed_by=token).order_by('run_after', 'id'))
+
+
+class Task(models.Model):
+    """A queued background job; removed once it has run successfully."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the workers' "what is due" poll
+            models.Index(fields=['status', 'run_after'], name='task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
@@ -0,0 +1,177 @@
+"""A small database-backed job queue.
+
+Handlers are registered with ``@task(name, ...)`` and jobs are added with
+``enqueue``, normally inside the transaction of the change that causes
+them so a job exists if and only if that change committed. ``Worker``
+claims due jobs, runs them and retries failures with exponential backoff.
+Handlers always receive a list of payloads: a handler registered with
+``batch_size`` > 1 gets up to that many jobs at once, and ``delay`` holds
+new jobs back so similar ones pile up into a single batch.
+
+With ``settings.TASKS_MODE == 'thread'`` worker threads run inside the
+web process from the moment the server loads the application
+(``start_server_workers``), poll for due jobs and are woken when a
+transaction that enqueued jobs commits; with ``'command'`` the jobs wait
+for ``manage.py run_tasks``.
+"""
+import logging
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class Handler:
+    __slots__ = ('func', 'batch_size', 'delay', 'max_attempts', 'backoff')
+
+    def __init__(self, func, batch_size, delay, max_attempts, backoff):
+        self.func = func
+        self.batch_size = batch_size
+        self.delay = delay
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def retry_in(self, attempts):
+        return min(self.backoff * 2 ** (attempts - 1), settings.TASKS_MAX_BACKOFF)
+
+
+def task(name, batch_size=1, delay=0, max_attempts=5, backoff=2):
+    """Register ``func(payloads)`` as the handler of jobs called ``name``.
+
+    ``delay`` and ``backoff`` are in seconds; a failing batch is retried as
+    a whole after ``backoff``, doubling each time, until ``max_attempts``.
+    """
+    def register(func):
+        HANDLERS[name] = Handler(func, batch_size, delay, max_attempts, backoff)
+        return func
+    return register
+
+
+def enqueue(name, payload):
+    return enqueue_many([(name, payload)])[0]
+
+
+def enqueue_many(jobs):
+    """Insert ``(name, payload)`` jobs with a single query."""
+    now = timezone.now()
+    tasks = []
+    for name, payload in jobs:
+        handler = HANDLERS[name]
+        tasks.append(Task(name=name, payload=payload, run_after=now + timedelta(seconds=handler.delay)))
+    tasks = Task.objects.bulk_create(tasks)
+    if settings.TASKS_MODE == 'thread':
+        transaction.on_commit(_wake)
+    return tasks
+
+
+class Worker:
+    """Claims due jobs and runs them; safe to run many side by side."""
+
+    def __init__(self, stop=None, wakeup=None):
+        self.stop = stop or threading.Event()
+        self.wakeup = wakeup or threading.Event()
+
+    def run_once(self):
+        """Run one batch of the oldest due job type; return how many jobs ran."""
+        name = Task.objects.due().order_by('run_after', 'id').values_list('name', flat=True).first()
+        if name is None:
+            return 0
+        handler = HANDLERS.get(name)
+        if handler is None:
+            # Nothing can run it: park the jobs instead of polling them forever
+            Task.objects.due().filter(name=name).update(status=Task.FAILED, last_error='No handler registered.')
+            return 0
+
+        token = uuid.uuid4().hex
+        lease_until = timezone.now() + timedelta(seconds=settings.TASKS_LEASE_SECONDS)
+        batch = Task.objects.claim(name, handler.batch_size, token, lease_until)
+        if not batch:
+            return 0
+        try:
+            handler.func([job.payload for job in batch])
+        except Exception:
+            logger.exception('Task %s failed for %d job(s)', name, len(batch))
+            self.retry(handler, batch, traceback.format_exc())
+        else:
+            Task.objects.filter(pk__in=[job.pk for job in batch], claimed_by=token).delete()
+        return len(batch)
+
+    def retry(self, handler, batch, error):
+        now = timezone.now()
+        for job in batch:
+            attempts = job.attempts + 1
+            if attempts >= handler.max_attempts:
+                changes = {'status': Task.FAILED}
+            else:
+                changes = {'status': Task.PENDING, 'run_after': now + timedelta(seconds=handler.retry_in(attempts))}
+            Task.objects.filter(pk=job.pk, claimed_by=job.claimed_by).update(
+                attempts=attempts, last_error=error, claimed_by='', locked_until=None, **changes
+            )
+
+    def drain(self):
+        """Run due jobs until none are left; return how many ran."""
+        total = 0
+        while True:
+            ran = self.run_once()
+            if not ran:
+                return total
+            total += ran
+
+    def run(self, poll_interval=None):
+        """Loop until ``stop`` is set, sleeping between polls when idle."""
+        poll_interval = poll_interval or settings.TASKS_POLL_INTERVAL
+        while not self.stop.is_set():
+            close_old_connections()
+            try:
+                ran = self.drain()
+            except Exception:
+                logger.exception('Task worker poll failed')
+                ran = 0
+            if not ran:
+                self.wakeup.wait(poll_interval)
+                self.wakeup.clear()
+        connections.close_all()
+
+
+_threads = []
+_threads_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def start_workers(count=None):
+    """Start the in-process worker threads once per process."""
+    with _threads_lock:
+        if not _threads:
+            for i in range(count or settings.TASKS_WORKERS):
+                thread = threading.Thread(
+                    target=Worker(wakeup=_wakeup).run, name=f'task-worker-{i}', daemon=True
+                )
+                thread.start()
+                _threads.append(thread)
+
+
+def start_server_workers():
+    """Start the pool at server boot in thread mode.
+
+    Called from backend.wsgi and backend.asgi, which only servers import
+    (management commands and the test client don't), so jobs left by a
+    previous process (retries, emails held for batching) run without
+    waiting for this process to enqueue one.
+    """
+    if settings.TASKS_MODE == 'thread':
+        start_workers()
+
+
+def _wake():
+    start_workers()
+    _wakeup.set()
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import HANDLERS, Worker, enqueue, enqueue_many, start_server_workers, task
+
+calls = []
+
+
+@task('tests.collect', batch_size=3)
+def collect(payloads):
+    calls.append([payload['n'] for payload in payloads])
+
+
+@task('tests.flaky', max_attempts=3, backoff=10)
+def flaky(payloads):
+    raise RuntimeError('downstream is down')
+
+
+@task('tests.later', delay=60)
+def later(payloads):
+    calls.append(payloads)
+
+
+@override_settings(TASKS_MODE='command')
+class WorkerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_similar_jobs_run_in_batches(self):
+        enqueue_many(('tests.collect', {'n': n}) for n in range(7))
+        self.assertEqual(Worker().drain(), 7)
+        self.assertEqual(calls, [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_back_off_then_give_up(self):
+        job = enqueue('tests.flaky', {})
+        before = timezone.now()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            Worker().drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.PENDING, 1))
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=10))
+        self.assertIn('downstream is down', job.last_error)
+
+        for attempts in (2, 3):
+            Task.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            with self.assertLogs('tasks.queue', 'ERROR'):
+                Worker().drain()
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempts)
+        self.assertEqual(job.status, Task.FAILED)
+        self.assertEqual(Worker().drain(), 0)
+
+    def test_delayed_jobs_wait(self):
+        enqueue('tests.later', {})
+        self.assertEqual(Worker().drain(), 0)
+        Task.objects.update(run_after=timezone.now())
+        self.assertEqual(Worker().drain(), 1)
+
+    def test_claimed_jobs_are_not_taken_twice(self):
+        enqueue_many(('tests.collect', {'n': n}) for n in range(2))
+        lease = timezone.now() + timedelta(minutes=5)
+        first = Task.objects.claim('tests.collect', 10, 'a', lease)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(Task.objects.claim('tests.collect', 10, 'b', lease), [])
+        # An expired lease (crashed worker) makes them due again
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(Task.objects.claim('tests.collect', 10, 'b', lease)), 2)
+
+    def test_unknown_jobs_are_parked(self):
+        Task.objects.create(name='tests.missing')
+        self.assertEqual(Worker().drain(), 0)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertNotIn('tests.missing', HANDLERS)
+
+    def test_run_tasks_once(self):
+        enqueue('tests.collect', {'n': 1})
+        out = StringIO()
+        call_command('run_tasks', '--once', stdout=out)
+        self.assertIn('Ran 1 job(s).', out.getvalue())
+        self.assertEqual(calls, [[1]])
+
+
+class ServerStartupTests(TestCase):
+    @override_settings(TASKS_MODE='thread')
+    def test_thread_mode_starts_workers_at_boot(self):
+        with mock.patch('tasks.queue.start_workers') as start:
+            start_server_workers()
+        start.assert_called_once_with()
+
+    @override_settings(TASKS_MODE='command')
+    def test_command_mode_leaves_jobs_to_run_tasks(self):
+        with mock.patch('tasks.queue.start_workers') as start:
+            start_server_workers()
+        start.assert_not_called()
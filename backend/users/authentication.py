@@ -0,0 +1,114 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """Small thread-safe LRU of user rows with a per-entry TTL.
+
+    The cache is per process: saves invalidate the local entry right away
+    and the TTL bounds how long other workers can serve a stale row.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Hand out a copy so per-request state (cached relations such as
+        # user.cart) never leaks between requests.
+        return copy.copy(user)
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.copy(user))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves the user row from ``user_cache``.
+
+    Warm requests authenticate without touching the database; the same
+    is_active and revoked-token checks as the parent class still apply.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(str(user_id))
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            user_cache.set(str(user_id), user)
+        return self.check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(str(user_id))
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            user_cache.set(str(user_id), user)
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """Async ``authenticate`` for plain Django requests (see backend.async_views)."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
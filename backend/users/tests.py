@@ -1,3 +1,49 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from .authentication import user_cache
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass12345')
+
+    def setUp(self):
+        user_cache.clear()
+        response = self.client.post('/api/users/login/', {'email': 'buyer@example.com', 'password': 'pass12345'})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    def test_warm_requests_skip_the_user_query(self):
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['email'], 'buyer@example.com')
+        with self.assertNumQueries(1):
+            self.client.get('/api/orders/')
+
+    def test_user_save_invalidates(self):
+        self.client.get('/api/users/me/')
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').data['username'], 'renamed')
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/users/me/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get('/api/users/me/')
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_cached_user_is_not_shared_between_requests(self):
+        self.client.get('/api/users/me/')
+        first = user_cache.get(str(self.user.id))
+        second = user_cache.get(str(self.user.id))
+        self.assertIsNot(first, second)
+        self.assertEqual(first.pk, second.pk)
@@ -1,7 +1,6 @@
 from rest_framework import generics, permissions
 from .serializers import RegisterSerializer, UserSerializer
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 User = get_user_model()
 
@@ -13,7 +12,6 @@ class RegisterView(generics.CreateAPIView):
 class UserDetailView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
 
     def get_object(self):
         return self.request.user